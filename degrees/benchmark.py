@@ -0,0 +1,136 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the shortest_path search engines."
+    )
+    parser.add_argument("--people", type=int, default=5000,
+                        help="people in the generated graph")
+    parser.add_argument("--movies", type=int, default=2000,
+                        help="movies in the generated graph")
+    parser.add_argument("--cast", type=int, default=4,
+                        help="average stars per generated movie")
+    parser.add_argument("--queries", type=int, default=20,
+                        help="random source/target pairs per dataset")
+    parser.add_argument("--seed", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+    benchmark("small", directory, args.queries, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate_graph(directory, args.people, args.movies, args.cast, rng)
+        benchmark(f"generated ({args.people} people)", directory, args.queries, rng)
+
+
+def generate_graph(directory, n_people, n_movies, cast, rng):
+    """
+    Write people.csv, movies.csv and stars.csv for a random graph to
+    `directory`. Each movie links two consecutive people so that the
+    whole graph is connected, and the rest of its cast is random.
+    """
+    with open(os.path.join(directory, "people.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            writer.writerow([i, f"Movie {i}", 1950 + i % 70])
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for i in range(n_people - 1):
+            writer.writerow([i, i % n_movies])
+            writer.writerow([i + 1, i % n_movies])
+        for movie in range(n_movies):
+            for _ in range(rng.randint(0, 2 * cast)):
+                writer.writerow([rng.randrange(n_people), movie])
+
+
+def benchmark(label, directory, n_queries, rng):
+    """
+    Load the dataset in `directory` and time each engine on the same
+    random pairs of connected people.
+    """
+    load(label, directory, compact=False)
+    connected = [
+        person for person in degrees.people
+        if degrees.people[person]["movies"]
+    ]
+    pairs = []
+    while len(pairs) < n_queries:
+        source, target = rng.sample(connected, 2)
+        if degrees.shortest_path(source, target, bidirectional=True) is not None:
+            pairs.append((source, target))
+
+    results = {}
+    for engine, bidirectional in (("bfs", False), ("bidirectional", True)):
+        results[engine] = run(engine, pairs, bidirectional)
+
+    load(label, directory, compact=True)
+    results["compact"] = run("compact", pairs, True)
+
+    # Once to write the snapshot and once to read it back
+    load(label, directory, compact=True, snapshot=True)
+    load(label, directory, compact=True, snapshot=True)
+    results["snapshot"] = run("snapshot", pairs, True)
+
+    start = time.perf_counter()
+    results["parallel"] = degrees.shortest_paths(pairs)
+    elapsed = time.perf_counter() - start
+    print(f"  {'parallel':>13}: {elapsed:.4f}s for {len(pairs)} queries "
+          f"on {os.cpu_count()} processes")
+
+    for engine in results:
+        for expected, path in zip(results["bfs"], results[engine]):
+            if len(expected) != len(path):
+                raise RuntimeError(f"{engine} disagrees on path length")
+
+
+def load(label, directory, compact, snapshot=False):
+    """
+    Reload the dataset in `directory`, reporting time and memory used.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(directory, compact=compact, snapshot=snapshot)
+    elapsed = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    mode = "snapshot" if snapshot else "compact" if compact else "dicts"
+    print(f"{label}, {mode}: loaded in {elapsed:.3f}s, "
+          f"{memory / 2 ** 20:.1f} MiB")
+
+
+def run(engine, pairs, bidirectional):
+    """
+    Time `shortest_path` on every pair and return the paths found.
+    """
+    start = time.perf_counter()
+    paths = [
+        degrees.shortest_path(source, target, bidirectional=bidirectional)
+        for source, target in pairs
+    ]
+    elapsed = time.perf_counter() - start
+    print(f"  {engine:>13}: {elapsed:.4f}s for {len(pairs)} queries "
+          f"({1000 * elapsed / len(pairs):.3f} ms/query)")
+    return paths
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,26 @@
+import argparse
 import csv
+import io
+import itertools
+import json
+import multiprocessing
+import operator
+import os
 import sys
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CoStarGraph
+from nameindex import NameIndex
+from snapshot import load_snapshot, save_snapshot, source_stamps
+from util import Node, StackFrontier, QueueFrontier, join_paths
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,55 +31,384 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact co-star graph, used instead of the movies/stars sets when loaded
+graph = None
+
+# Arguments of the last load_data call, and the directories added with
+# append_data since, to repeat them in new processes
+loaded_from = None
+appended = []
+
+# Queries sent to a worker process at a time
+CHUNK_SIZE = 64
+
+# Rows parsed from a CSV file at a time
+CSV_CHUNK_ROWS = 10000
+
+# Rows read and seconds taken by the last load_data or append_data
+load_stats = {"rows": 0, "seconds": 0}
+
+# Maps person_ids to the number of their connected component, and each
+# component number to how many people it has (the compact `graph` keeps
+# its own labels instead)
+components = {}
+component_sizes = []
 
-def load_data(directory):
+# Prefix and fuzzy index over the keys of `names`, built on first use
+name_index = None
+
+# Maps source person_ids to their cached (distances, parents) from `bfs_tree`
+trees = {}
+
+
+def load_data(directory, compact=False, snapshot=True):
     """
     Load data from CSV files into memory.
+
+    If `compact` is True, the links between people and movies are
+    stored only in the integer-indexed `graph` instead of in a set per
+    person and per movie. With `snapshot` also True, the data is then
+    memory-mapped from the binary snapshot next to the CSV files, which
+    is rewritten first whenever it is missing or older than the CSVs.
+
+    The rows read and the time taken are recorded in `load_stats`.
     """
+    load_stats.update(rows=0, seconds=0)
+    start = time.perf_counter()
+    read_data(directory, compact, snapshot)
+    load_stats["seconds"] = time.perf_counter() - start
+
+
+def read_data(directory, compact, snapshot):
+    """
+    Does the work of `load_data`.
+    """
+    global graph, people, movies, names, loaded_from, component_sizes
+    global name_index
+    loaded_from = (directory, compact, snapshot)
+    appended.clear()
+    trees.clear()
+    name_index = None
+    graph = None
+    people, movies, names = {}, {}, {}
+
+    if compact and snapshot:
+        stamps = source_stamps(directory)
+        loaded = load_snapshot(directory, stamps)
+        if loaded is not None:
+            graph, people, movies, names = loaded
+            components.clear()
+            component_sizes = graph.component_sizes
+            return
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
+    for chunk in read_csv(f"{directory}/people.csv", ("id", "name", "birth")):
+        for person_id, name, birth in chunk:
+            people[person_id] = {
+                "name": name,
+                "birth": birth
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+            if not compact:
+                people[person_id]["movies"] = set()
+            key = name.lower()
+            if key not in names:
+                names[key] = {person_id}
             else:
-                names[row["name"].lower()].add(row["id"])
+                names[key].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
+    for chunk in read_csv(f"{directory}/movies.csv", ("id", "title", "year")):
+        for movie_id, title, year in chunk:
+            movies[movie_id] = {
+                "title": title,
+                "year": year
             }
+            if not compact:
+                movies[movie_id]["stars"] = set()
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
+    stars = read_csv(f"{directory}/stars.csv", ("person_id", "movie_id"))
+    if compact:
+        graph = CoStarGraph.from_stars(
+            list(people), list(movies), itertools.chain.from_iterable(stars)
+        )
+        if snapshot:
             try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
+                save_snapshot(directory, stamps, graph, people, movies)
+            except OSError:
+                pass
+        components.clear()
+        component_sizes = graph.component_sizes
+        return
+
+    for chunk in stars:
+        for person_id, movie_id in chunk:
+            try:
+                people[person_id]["movies"].add(movie_id)
+                movies[movie_id]["stars"].add(person_id)
             except KeyError:
                 pass
 
+    component_sizes = label_components()
+
+
+def read_csv(path, fields):
+    """
+    Yields the rows of a CSV file in chunks of up to CSV_CHUNK_ROWS,
+    each row a tuple of the given fields, counting them in `load_stats`.
+
+    Rows are parsed with a plain `csv.reader` and picked apart with one
+    `itemgetter`, which costs far less per row than a `csv.DictReader`.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        pick = operator.itemgetter(*(header.index(field) for field in fields))
+        while True:
+            chunk = list(map(pick, itertools.islice(reader, CSV_CHUNK_ROWS)))
+            if not chunk:
+                return
+            load_stats["rows"] += len(chunk)
+            yield chunk
+
+
+def append_data(directory):
+    """
+    Adds the people, movies and stars in the CSV files in `directory`
+    to the loaded data, without reloading or rebuilding it. Any of the
+    three files may be missing. Rows for ids that are already loaded
+    are skipped. Like `load_data`, records its rows in `load_stats`.
+    """
+    load_stats.update(rows=0, seconds=0)
+    start = time.perf_counter()
+    appended.append(directory)
+    for filename, fields, add in (
+        ("people.csv", ("id", "name", "birth"), add_person),
+        ("movies.csv", ("id", "title", "year"), add_movie),
+        ("stars.csv", ("person_id", "movie_id"), add_star),
+    ):
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            continue
+        for chunk in read_csv(path, fields):
+            for row in chunk:
+                add(*row)
+    load_stats["seconds"] = time.perf_counter() - start
+
+
+def add_person(person_id, name, birth):
+    """
+    Adds a person with no movies yet, unless they are already loaded.
+    """
+    global component_sizes
+    if person_id in people:
+        return
+    people[person_id] = {"name": name, "birth": birth}
+    key = name.lower()
+    if name_index is not None and key not in names:
+        name_index.add(key)
+    names[key] = names.get(key, set()) | {person_id}
+    if graph is not None:
+        graph.add_person(person_id)
+        component_sizes = graph.component_sizes
+    else:
+        people[person_id]["movies"] = set()
+        components[person_id] = len(component_sizes)
+        component_sizes.append(1)
+
+
+def add_movie(movie_id, title, year):
+    """
+    Adds a movie with no stars yet, unless it is already loaded.
+    """
+    if movie_id in movies:
+        return
+    movies[movie_id] = {"title": title, "year": year}
+    if graph is not None:
+        graph.add_movie(movie_id)
+    else:
+        movies[movie_id]["stars"] = set()
+
+
+def add_star(person_id, movie_id):
+    """
+    Links a loaded person to a loaded movie they starred in, merging
+    connected components as needed. Unknown ids are skipped.
+    """
+    global component_sizes
+    if person_id not in people or movie_id not in movies:
+        return
+    trees.clear()
+    if graph is not None:
+        graph.add_star(graph.person_index[person_id], graph.movie_index[movie_id])
+        component_sizes = graph.component_sizes
+        return
+
+    stars = movies[movie_id]["stars"]
+    if person_id in stars:
+        return
+    people[person_id]["movies"].add(movie_id)
+    if stars:
+        merge_components(person_id, next(iter(stars)))
+    stars.add(person_id)
+
+
+def merge_components(person_id, other_id):
+    """
+    Merges the components of two people by relabelling the smaller one.
+    """
+    keep, drop = components[person_id], components[other_id]
+    if keep == drop:
+        return
+    start = other_id
+    if component_sizes[keep] < component_sizes[drop]:
+        keep, drop = drop, keep
+        start = person_id
+    components[start] = keep
+    frontier = [start]
+    while frontier:
+        for movie_id in people[frontier.pop()]["movies"]:
+            for neighbor in movies[movie_id]["stars"]:
+                if components[neighbor] == drop:
+                    components[neighbor] = keep
+                    frontier.append(neighbor)
+    component_sizes[keep] += component_sizes[drop]
+    component_sizes[drop] = 0
+
+
+def peak_rss():
+    """
+    Returns the peak resident memory of this process in MiB, or None
+    where the platform cannot report it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def describe_load():
+    """
+    Returns a line describing the rows read by the last load, how fast,
+    and the peak memory use so far.
+    """
+    seconds = load_stats["seconds"]
+    rows = load_stats["rows"]
+    if rows:
+        rate = rows / seconds if seconds else 0
+        line = f"Read {rows} rows in {seconds:.2f}s ({rate:.0f} rows/s)"
+    else:
+        line = f"Loaded in {seconds:.3f}s without reading rows"
+    rss = peak_rss()
+    if rss is not None:
+        line += f", peak RSS {rss:.1f} MiB"
+    return line
+
+
+def label_components():
+    """
+    Labels every person in `components` with the number of their
+    connected component and returns the size of each component.
+    Each movie's stars are scanned only once.
+    """
+    components.clear()
+    sizes = []
+    seen_movies = set()
+    for start in people:
+        if start in components:
+            continue
+        label = len(sizes)
+        components[start] = label
+        frontier = [start]
+        size = 0
+        while frontier:
+            person_id = frontier.pop()
+            size += 1
+            for movie_id in people[person_id]["movies"] - seen_movies:
+                seen_movies.add(movie_id)
+                for neighbor in movies[movie_id]["stars"]:
+                    if neighbor not in components:
+                        components[neighbor] = label
+                        frontier.append(neighbor)
+        sizes.append(size)
+    return sizes
+
+
+def connected(source, target):
+    """
+    Returns whether the source and target are in the same connected
+    component, and so have any path between them.
+    """
+    if graph is not None:
+        return graph.connected(graph.person_index[source], graph.person_index[target])
+    return components[source] == components[target]
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "small"
+    parser = argparse.ArgumentParser(
+        description="Find degrees of separation between two people."
+    )
+    parser.add_argument("directory", nargs="?", default="small")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer source/target pairs from FILE "
+                             "('-' for stdin) as JSON lines")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="answer queries over HTTP on PORT")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to serve on (default 127.0.0.1)")
+    parser.add_argument("--append", metavar="DIRECTORY", action="append",
+                        default=[],
+                        help="add the rows in DIRECTORY's CSV files to the "
+                             "loaded data (may be repeated)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes answering batch queries (default 1)")
+    parser.add_argument("--components", action="store_true",
+                        help="print the sizes of the largest connected "
+                             "components")
+    parser.add_argument("--histogram", metavar="NAME",
+                        help="print how many people are each number of "
+                             "degrees away from NAME")
+    args = parser.parse_args()
+
+    # Keep stdout for the results when answering many queries
+    log = sys.stdout
+    if args.batch or args.serve or args.histogram or args.components:
+        log = sys.stderr
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    load_data(args.directory, compact=True)
+    print("Data loaded.", file=log)
+    print(describe_load(), file=log)
+    for directory in args.append:
+        append_data(directory)
+        print(f"Appended {directory}. {describe_load()}", file=log)
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, args.workers)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, args.workers)
+        return
+    if args.serve:
+        serve(args.host, args.serve)
+        return
+    if args.components:
+        # Components merged by appended data are left empty
+        sizes = sorted((size for size in component_sizes if size), reverse=True)
+        print(f"{len(sizes)} connected components")
+        for size in sizes[:10]:
+            print(f"  {size} people")
+        return
+    if args.histogram:
+        source = person_id_for_name(args.histogram)
+        if source is None:
+            sys.exit("Person not found.")
+        for distance, count in degree_histogram(source).items():
+            print(f"{distance} degrees: {count}")
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,7 +417,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
     
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional=True)
 
     if path is None:
         print("Not connected.")
@@ -84,13 +432,232 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def query(source_name, target_name):
+    """
+    Answers one query without prompting, returning a dictionary
+    that can be written as JSON.
+
+    Names are resolved like `person_id_for_name`, except that a person_id
+    is also accepted, an ambiguous name resolves to its best-ranked person
+    (see `rank_candidates`) with the others listed, and an unknown name
+    is reported with the closest names as suggestions.
+    """
+    result = {"source": source_name, "target": target_name}
+    ids = []
+    for field, name in (("source", source_name), ("target", target_name)):
+        if name in people:
+            ids.append(name)
+            continue
+        person_ids = rank_candidates(names.get(name.lower(), set()))
+        if len(person_ids) == 0:
+            result["error"] = f"Person not found: {name}"
+            result["suggestions"] = suggest_names(name)
+            return result
+        if len(person_ids) > 1:
+            result[f"{field}_candidates"] = person_ids
+        ids.append(person_ids[0])
+
+    source, target = ids
+    path = shortest_path(source, target, bidirectional=True)
+    if path is None:
+        result["degrees"] = None
+        return result
+
+    result["degrees"] = len(path)
+    result["path"] = [
+        {
+            "movie_id": movie_id,
+            "title": movies[movie_id]["title"],
+            "person_id": person_id,
+            "name": people[person_id]["name"]
+        }
+        for movie_id, person_id in path
+    ]
+    return result
+
+
+def parse_query(line):
+    """
+    Returns the (source, target) names in one line of batch input,
+    either a JSON object with "source" and "target" keys or two names
+    separated by a tab. Returns None for a blank line.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        request = json.loads(line)
+        return request["source"], request["target"]
+    source, target = line.split("\t")
+    return source.strip(), target.strip()
+
+
+def answer_line(line):
+    """
+    Returns the JSON result for one line of batch input,
+    or None for a blank line.
+    """
+    try:
+        pair = parse_query(line)
+    except (ValueError, KeyError, TypeError):
+        return json.dumps({"error": f"Bad query: {line.strip()}"})
+    if pair is None:
+        return None
+    return json.dumps(query(*pair))
+
+
+def run_batch(lines, output, workers=1):
+    """
+    Answers every query in `lines`, writing one JSON result per line
+    to `output` in the same order.
+
+    With more than one worker, queries are answered by a process pool
+    (see `query_pool`) and streamed back in input order.
+    """
+    if workers > 1:
+        with query_pool(workers) as pool:
+            write_results(pool.imap(answer_line, lines, CHUNK_SIZE), output)
+    else:
+        write_results(map(answer_line, lines), output)
+
+
+def write_results(results, output):
+    for result in results:
+        if result is not None:
+            output.write(result + "\n")
+    output.flush()
+
+
+def shortest_paths(pairs, workers=None, bidirectional=True):
+    """
+    Returns `shortest_path(source, target, bidirectional)` for every
+    (source, target) pair of person_ids, in the same order, using a pool
+    of `workers` processes (by default one per CPU).
+    """
+    with query_pool(workers) as pool:
+        return pool.starmap(
+            shortest_path,
+            [(source, target, bidirectional) for source, target in pairs],
+            CHUNK_SIZE
+        )
+
+
+def query_pool(workers=None):
+    """
+    Returns a process pool whose workers can answer queries on the
+    loaded data without it being pickled.
+
+    Where processes can be forked, workers inherit the loaded data
+    (and the memory-mapped snapshot) from this process. Otherwise each
+    worker loads the data itself, which is fast from a snapshot, and
+    appends the same directories (see `reload_data`).
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(workers)
+    return multiprocessing.get_context("spawn").Pool(
+        workers, initializer=reload_data, initargs=(loaded_from, list(appended))
+    )
+
+
+def reload_data(arguments, directories):
+    """
+    Repeats a `load_data` call with `arguments` and the `append_data`
+    calls for `directories` that followed it, as recorded in
+    `loaded_from` and `appended`.
+    """
+    load_data(*arguments)
+    for directory in directories:
+        append_data(directory)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /?source=NAME&target=NAME with one JSON result, and
+    POST / with batch input in the body with JSON lines.
+    """
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        if "source" not in params or "target" not in params:
+            self.respond(400, {"error": "source and target are required"})
+            return
+        self.respond(200, query(params["source"][0], params["target"][0]))
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.respond(400, {"error": "Content-Length must be a number of bytes"})
+            return
+        lines = self.rfile.read(length).decode("utf-8").splitlines()
+        body = io.StringIO()
+        run_batch(lines, body)
+        self.send(200, "application/x-ndjson", body.getvalue().encode("utf-8"))
+
+    def respond(self, status, result):
+        self.send(status, "application/json", json.dumps(result).encode("utf-8"))
+
+    def send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Logging every request would cost more than answering it
+        pass
+
+
+def serve(host, port):
+    """
+    Answers queries over HTTP until interrupted, keeping the loaded
+    data in memory between requests.
+    """
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    print(f"Serving on http://{host}:{server.server_port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def shortest_path(source, target, bidirectional=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
-    If no possible path, returns None.
+    If `bidirectional` is True, searches from both ends at once
+    (see `bidirectional_path`) instead of only from the source. When
+    the compact `graph` is loaded, it is searched the same way.
+
+    If a breadth-first tree from the source is cached (see `bfs_tree`),
+    the path is read from it instead of searching.
+
+    If no possible path, returns None, which is known without searching
+    when the two people are in different connected components.
     """
+    if not connected(source, target):
+        return None
+    if source in trees:
+        return path_in_tree(trees[source], target)
+    if graph is not None:
+        path = graph.shortest_path(
+            graph.person_index[source], graph.person_index[target], bidirectional
+        )
+        if path is None:
+            return None
+        return [
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path
+        ]
+    if bidirectional:
+        return bidirectional_path(source, target)
+
     pairs = []
     starting_node = Node(state=source, parent=None, action=None)
     frontier = QueueFrontier()
@@ -102,7 +669,7 @@ def shortest_path(source, target):
     
     while not frontier.empty():
         node = frontier.remove()
-        explored.add(node)
+        explored.add(node.state)
         
         
         neighbors = neighbors_for_person(node.state)
@@ -123,15 +690,142 @@ def shortest_path(source, target):
                 for action in actions:
                     pairs.append((action, cells[i]))
                     i += 1
-                print(pairs)   
                 return pairs
                 
-            if not new_node in explored and not frontier.contains_state(new_node.state):
+            if new_node.state not in explored and not frontier.contains_state(new_node.state):
                 frontier.add(new_node)
         
     return None
 
 
+def bidirectional_path(source, target):
+    """
+    Returns the same kind of path as `shortest_path`, but grows a
+    breadth-first search from the source and one from the target,
+    always expanding whole levels of the smaller side, and stops as
+    soon as the two searches meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to (movie_id, person_id, depth), where
+    # person_id is the next person towards the search's starting point.
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    forward_depth = backward_depth = 0
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_depth += 1
+            forward_frontier, meeting = expand_level(
+                forward_frontier, forward, backward, forward_depth
+            )
+            if meeting is not None:
+                person, movie_id, other = meeting
+                return join_paths(forward, backward, person, movie_id, other)
+        else:
+            backward_depth += 1
+            backward_frontier, meeting = expand_level(
+                backward_frontier, backward, forward, backward_depth
+            )
+            if meeting is not None:
+                person, movie_id, other = meeting
+                return join_paths(forward, backward, other, movie_id, person)
+
+    return None
+
+
+def expand_level(frontier, reached, other_reached, depth):
+    """
+    Expands every person in `frontier` by one hop, recording new people
+    in `reached` at the given depth.
+
+    Returns the next frontier and the best (person, movie_id, other)
+    link into `other_reached` found on this level, or None.
+    """
+    next_frontier = []
+    meeting = None
+    best = None
+    for person in frontier:
+        for movie_id, neighbor in neighbors_for_person(person):
+            if neighbor == person:
+                continue
+            if neighbor in other_reached:
+                other = other_reached[neighbor]
+                length = depth + (other[2] if other is not None else 0)
+                if best is None or length < best:
+                    best = length
+                    meeting = (person, movie_id, neighbor)
+            if neighbor not in reached:
+                reached[neighbor] = (movie_id, person, depth)
+                next_frontier.append(neighbor)
+    return next_frontier, meeting
+
+
+def bfs_tree(source, cache=True):
+    """
+    Runs one breadth-first search from the source over everyone it can
+    reach and returns (distances, parents): `distances` maps each reached
+    person_id to their degrees of separation from the source, and
+    `parents` maps each of them except the source to the (movie_id,
+    person_id) step that first reached them.
+
+    If `cache` is True, the tree is kept so that later calls to
+    `shortest_path` from the same source only read it.
+    """
+    if source in trees:
+        return trees[source]
+
+    distances = {source: 0}
+    parents = {}
+    frontier = deque([source])
+    while frontier:
+        person_id = frontier.popleft()
+        distance = distances[person_id] + 1
+        for movie_id, neighbor in neighbors_for_person(person_id):
+            if neighbor not in distances:
+                distances[neighbor] = distance
+                parents[neighbor] = (movie_id, person_id)
+                frontier.append(neighbor)
+
+    if cache:
+        trees[source] = (distances, parents)
+    return distances, parents
+
+
+def path_in_tree(tree, target):
+    """
+    Returns the (movie_id, person_id) path to the target in a tree from
+    `bfs_tree`, or None if the target was not reached.
+    """
+    distances, parents = tree
+    if target not in distances:
+        return None
+    pairs = []
+    while target in parents:
+        movie_id, previous = parents[target]
+        pairs.append((movie_id, target))
+        target = previous
+    pairs.reverse()
+    return pairs
+
+
+def degree_histogram(source):
+    """
+    Returns a dictionary mapping each degree of separation to the number
+    of people that far from the source, using its `bfs_tree`.
+    """
+    distances, _ = bfs_tree(source)
+    histogram = {}
+    for distance in distances.values():
+        histogram[distance] = histogram.get(distance, 0) + 1
+    return dict(sorted(histogram.items()))
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -158,11 +852,78 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def get_name_index():
+    """
+    Returns the `NameIndex` over all names, building it on first use.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(names)
+    return name_index
+
+
+def suggest_names(name, limit=10):
+    """
+    Returns up to `limit` known names like `name`: names starting with it
+    first, then the closest fuzzy matches.
+    """
+    return [
+        people[rank_candidates(names[match])[0]]["name"]
+        for match in get_name_index().search(name, limit)
+    ]
+
+
+def candidates_for_name(name, limit=10, by="movies"):
+    """
+    Returns up to `limit` person_ids for `name` without prompting: people
+    with exactly that name first, then people whose names start with it,
+    then the closest fuzzy matches, each name's people ranked by
+    `rank_candidates`.
+    """
+    candidates = []
+    for match in get_name_index().search(name, limit):
+        candidates.extend(rank_candidates(names[match], by))
+    return candidates[:limit]
+
+
+def rank_candidates(person_ids, by="movies"):
+    """
+    Returns person_ids ordered best first, either by "movies" (most
+    movies starred in first) or by "birth" (most recently born first),
+    with person_id breaking ties.
+    """
+    if by == "movies":
+        def key(person_id):
+            return (-movie_count(person_id), person_id)
+    elif by == "birth":
+        def key(person_id):
+            birth = people[person_id]["birth"]
+            return (-int(birth) if birth.isdigit() else 0, person_id)
+    else:
+        raise ValueError(f"Cannot rank candidates by {by}")
+    return sorted(person_ids, key=key)
+
+
+def movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    if graph is not None:
+        person = graph.person_index[person_id]
+        return graph.person_offsets[person + 1] - graph.person_offsets[person]
+    return len(people[person_id]["movies"])
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return {
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index[person_id])
+        }
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,359 @@
+from array import array
+from collections import ChainMap
+
+from util import join_paths
+
+
+class CoStarGraph():
+    """
+    Co-star graph with people and movies numbered from 0, kept as two
+    CSR (compressed sparse row) adjacency lists in flat integer arrays:
+
+        movies of person p: person_movies[person_offsets[p]:person_offsets[p + 1]]
+        stars of movie m:   movie_people[movie_offsets[m]:movie_offsets[m + 1]]
+
+    `person_ids` and `movie_ids` map the integer numbers back to IMDB ids,
+    and `person_index` and `movie_index` map IMDB ids to numbers.
+    `components` labels each person with their connected component, and
+    `component_sizes` counts the people in each component.
+
+    People, movies and links added after the arrays were built (see
+    `add_person`, `add_movie` and `add_star`) are kept in `added_movies`
+    and `added_stars`, which map numbers to lists of extra movies and
+    extra stars.
+    """
+
+    def __init__(self, person_ids, movie_ids,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 person_index=None, movie_index=None,
+                 components=None, component_sizes=None):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        if person_index is None:
+            person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        self.added_movies = {}
+        self.added_stars = {}
+        if components is None:
+            components, component_sizes = self.label_components()
+        self.components = components
+        self.component_sizes = component_sizes
+
+    @classmethod
+    def from_stars(cls, person_ids, movie_ids, stars):
+        """
+        Build a graph from lists of person and movie ids and an iterable
+        of (person_id, movie_id) pairs. Pairs naming an unknown person
+        or movie are skipped.
+        """
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edge_people = array("i")
+        edge_movies = array("i")
+        for person_id, movie_id in stars:
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is None or movie is None:
+                continue
+            edge_people.append(person)
+            edge_movies.append(movie)
+
+        person_offsets, person_movies = csr(len(person_ids), edge_people, edge_movies)
+        movie_offsets, movie_people = csr(len(movie_ids), edge_movies, edge_people)
+        return cls(person_ids, movie_ids,
+                   person_offsets, person_movies, movie_offsets, movie_people,
+                   person_index, movie_index)
+
+    def label_components(self):
+        """
+        Returns (components, component_sizes) for the graph, found with
+        one breadth-first search per component that scans each movie's
+        stars only once.
+        """
+        components = array("i", [-1]) * len(self.person_ids)
+        seen_movies = bytearray(len(self.movie_ids))
+        component_sizes = array("q")
+        for start in range(len(components)):
+            if components[start] != -1:
+                continue
+            label = len(component_sizes)
+            components[start] = label
+            frontier = array("i", [start])
+            size = 0
+            while frontier:
+                person = frontier.pop()
+                size += 1
+                for movie in self.movies_of(person):
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for neighbor in self.stars_of(movie):
+                        if components[neighbor] == -1:
+                            components[neighbor] = label
+                            frontier.append(neighbor)
+            component_sizes.append(size)
+        return components, component_sizes
+
+    def connected(self, source, target):
+        """
+        Returns whether people `source` and `target` are in the same
+        connected component.
+        """
+        return self.components[source] == self.components[target]
+
+    def movies_of(self, person):
+        """
+        Returns the movie numbers of `person`.
+        """
+        movies = self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+        added = self.added_movies.get(person)
+        return movies if added is None else list(movies) + added
+
+    def stars_of(self, movie):
+        """
+        Returns the person numbers of the stars of `movie`.
+        """
+        stars = self.movie_people[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+        added = self.added_stars.get(movie)
+        return stars if added is None else list(stars) + added
+
+    def neighbors(self, person):
+        """
+        Yield (movie, person) number pairs for everyone who starred
+        with `person`, including `person` itself.
+        """
+        for movie in self.movies_of(person):
+            for neighbor in self.stars_of(movie):
+                yield movie, neighbor
+
+    def shortest_path(self, source, target, bidirectional=True):
+        """
+        Returns the shortest list of (movie, person) number pairs that
+        connect person `source` to person `target`, using a bidirectional
+        breadth-first search over the adjacency arrays, or one from the
+        source only (see `forward_path`) if `bidirectional` is False.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return []
+        if not self.connected(source, target):
+            return None
+        if not bidirectional:
+            return self.forward_path(source, target)
+
+        # Maps each reached person to (movie, person, depth), where person
+        # is the next person towards the search's starting point.
+        forward = {source: None}
+        backward = {target: None}
+        forward_frontier = array("i", [source])
+        backward_frontier = array("i", [target])
+        forward_depth = backward_depth = 0
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_depth += 1
+                forward_frontier, meeting = self.expand_level(
+                    forward_frontier, forward, backward, forward_depth
+                )
+                if meeting is not None:
+                    person, movie, other = meeting
+                    return join_paths(forward, backward, person, movie, other)
+            else:
+                backward_depth += 1
+                backward_frontier, meeting = self.expand_level(
+                    backward_frontier, backward, forward, backward_depth
+                )
+                if meeting is not None:
+                    person, movie, other = meeting
+                    return join_paths(forward, backward, other, movie, person)
+
+        return None
+
+    def forward_path(self, source, target):
+        """
+        Returns the same kind of path as `shortest_path`, found by a
+        breadth-first search from `source` alone that stops on reaching
+        `target`, or None if it never does.
+        """
+        movies_of, stars_of = self.movies_of, self.stars_of
+        # Maps each reached person to the (movie, person) step reaching them
+        parents = {source: None}
+        frontier = array("i", [source])
+        while frontier:
+            next_frontier = array("i")
+            for person in frontier:
+                for movie in movies_of(person):
+                    for neighbor in stars_of(movie):
+                        if neighbor in parents:
+                            continue
+                        parents[neighbor] = (movie, person)
+                        if neighbor == target:
+                            path = []
+                            while parents[neighbor] is not None:
+                                movie, previous = parents[neighbor]
+                                path.append((movie, neighbor))
+                                neighbor = previous
+                            path.reverse()
+                            return path
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return None
+
+    def expand_level(self, frontier, reached, other_reached, depth):
+        """
+        Expands every person in `frontier` by one hop, recording new people
+        in `reached` at the given depth.
+
+        Returns the next frontier and the best (person, movie, other) link
+        into `other_reached` found on this level, or None.
+        """
+        movies_of, stars_of = self.movies_of, self.stars_of
+        next_frontier = array("i")
+        meeting = None
+        best = None
+        for person in frontier:
+            for movie in movies_of(person):
+                for neighbor in stars_of(movie):
+                    if neighbor == person:
+                        continue
+                    if neighbor in other_reached:
+                        other = other_reached[neighbor]
+                        length = depth + (other[2] if other is not None else 0)
+                        if best is None or length < best:
+                            best = length
+                            meeting = (person, movie, neighbor)
+                    if neighbor not in reached:
+                        reached[neighbor] = (movie, person, depth)
+                        next_frontier.append(neighbor)
+        return next_frontier, meeting
+
+    def add_person(self, person_id):
+        """
+        Adds a person with no movies yet, in a component of their own,
+        and returns their number.
+        """
+        self.make_growable()
+        person = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_index[person_id] = person
+        self.person_offsets.append(self.person_offsets[-1])
+        self.components.append(len(self.component_sizes))
+        self.component_sizes.append(1)
+        return person
+
+    def add_movie(self, movie_id):
+        """
+        Adds a movie with no stars yet and returns its number.
+        """
+        self.make_growable()
+        movie = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_index[movie_id] = movie
+        self.movie_offsets.append(self.movie_offsets[-1])
+        return movie
+
+    def add_star(self, person, movie):
+        """
+        Links `person` to `movie`, merging connected components if the
+        movie already had stars from another component.
+        """
+        self.make_growable()
+        stars = self.stars_of(movie)
+        if person in stars:
+            return
+        self.added_movies.setdefault(person, []).append(movie)
+        self.added_stars.setdefault(movie, []).append(person)
+        if len(stars):
+            self.merge_components(person, stars[0])
+
+    def merge_components(self, person, other):
+        """
+        Merges the components of `person` and `other` by relabelling
+        the smaller one.
+        """
+        components, sizes = self.components, self.component_sizes
+        keep, drop = components[person], components[other]
+        if keep == drop:
+            return
+        start = other
+        if sizes[keep] < sizes[drop]:
+            keep, drop = drop, keep
+            start = person
+        components[start] = keep
+        frontier = [start]
+        while frontier:
+            for _, neighbor in self.neighbors(frontier.pop()):
+                if components[neighbor] == drop:
+                    components[neighbor] = keep
+                    frontier.append(neighbor)
+        sizes[keep] += sizes[drop]
+        sizes[drop] = 0
+
+    def make_growable(self):
+        """
+        Copies any read-only (memory-mapped) id tables, indexes, offsets
+        and labels into structures that can be appended to, once.
+        """
+        if not hasattr(self.person_ids, "append"):
+            self.person_ids = Appended(self.person_ids)
+            self.movie_ids = Appended(self.movie_ids)
+        if not isinstance(self.person_index, dict):
+            self.person_index = ChainMap({}, self.person_index)
+            self.movie_index = ChainMap({}, self.movie_index)
+        for name in ("person_offsets", "movie_offsets", "components", "component_sizes"):
+            value = getattr(self, name)
+            if not isinstance(value, array):
+                setattr(self, name, array(value.format, value))
+
+
+class Appended():
+    """
+    Sequence of the items of a read-only `base` sequence followed by
+    any appended items.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.added = []
+
+    def __len__(self):
+        return len(self.base) + len(self.added)
+
+    def __getitem__(self, i):
+        if i < len(self.base):
+            return self.base[i]
+        return self.added[i - len(self.base)]
+
+    def __iter__(self):
+        yield from self.base
+        yield from self.added
+
+    def append(self, item):
+        self.added.append(item)
+
+def csr(size, rows, columns):
+    """
+    Group `columns` by `rows` (parallel arrays of numbers below `size`
+    and of any range) with a counting sort, returning (offsets, values).
+    """
+    offsets = array("q", bytes(8 * (size + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    values = array("i", bytes(4 * len(rows)))
+    position = offsets[:-1]
+    for row, column in zip(rows, columns):
+        values[position[row]] = column
+        position[row] += 1
+    return offsets, values
+
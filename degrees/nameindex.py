@@ -0,0 +1,122 @@
+import bisect
+import heapq
+from array import array
+
+# Name positions read from trigram postings per fuzzy lookup, at most,
+# unless the rarest trigram alone has more
+POSTINGS_BUDGET = 2000
+
+
+class NameIndex():
+    """
+    Index of lowercase names for prefix and fuzzy lookups.
+
+    Names are kept sorted for prefix searches by binary search, and each
+    trigram (three consecutive characters, with the name padded by
+    spaces) maps to the positions of the names containing it, so fuzzy
+    matches only look at names sharing a trigram with the query.
+    Names added later (see `add`) are searched by a scan instead.
+    """
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.trigrams = {}
+        # Number of distinct trigrams in each name
+        self.sizes = array("H")
+        for i, name in enumerate(self.names):
+            name_trigrams = trigrams(name)
+            self.sizes.append(min(len(name_trigrams), 0xFFFF))
+            for trigram in name_trigrams:
+                postings = self.trigrams.get(trigram)
+                if postings is None:
+                    postings = self.trigrams[trigram] = array("i")
+                postings.append(i)
+        self.added = []
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, in order.
+        """
+        prefix = prefix.lower()
+        i = bisect.bisect_left(self.names, prefix)
+        matches = []
+        while i < len(self.names) and len(matches) < limit:
+            if not self.names[i].startswith(prefix):
+                break
+            matches.append(self.names[i])
+            i += 1
+        for name in sorted(self.added):
+            if name.startswith(prefix) and len(matches) < limit:
+                matches.append(name)
+        return matches
+
+    def fuzzy(self, query, limit=10):
+        """
+        Returns up to `limit` (score, name) pairs for the names most like
+        `query`, best first, scored by the Dice coefficient of their
+        trigrams (1 for the same trigrams, 0 for none in common).
+        """
+        wanted = trigrams(query.lower())
+        if not wanted:
+            return []
+        postings = sorted(
+            (self.trigrams[trigram] for trigram in wanted if trigram in self.trigrams),
+            key=len
+        )
+        # Count shared trigrams from the rarest trigrams up, stopping
+        # before a common trigram would touch much of the index.
+        shared = {}
+        read = 0
+        for names in postings:
+            if read and read + len(names) > POSTINGS_BUDGET:
+                break
+            read += len(names)
+            for name in names:
+                shared[name] = shared.get(name, 0) + 1
+
+        # Score the best candidates on all of their trigrams
+        best = heapq.nlargest(limit * 5, shared, key=shared.get)
+        scored = []
+        for position in best:
+            name = self.names[position]
+            common = len(wanted & trigrams(name))
+            scored.append((2 * common / (len(wanted) + self.sizes[position]), name))
+        for name in self.added:
+            name_trigrams = trigrams(name)
+            common = len(wanted & name_trigrams)
+            if common:
+                scored.append((2 * common / (len(wanted) + len(name_trigrams)), name))
+        scored.sort(key=lambda match: (-match[0], match[1]))
+        return scored[:limit]
+
+    def add(self, name):
+        """
+        Adds a lowercase name to the index.
+        """
+        self.added.append(name)
+
+    def search(self, query, limit=10):
+        """
+        Returns up to `limit` names matching `query`: the exact name first,
+        then names starting with it, then the closest fuzzy matches.
+        """
+        query = query.lower()
+        matches = []
+        for name in self.prefix(query, limit):
+            matches.append(name)
+        if len(matches) < limit:
+            for _, name in self.fuzzy(query, limit):
+                if name not in matches:
+                    matches.append(name)
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+def trigrams(name):
+    """
+    Returns the set of trigrams of `name`, padded with two spaces in
+    front and one behind so that short names and word starts count.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
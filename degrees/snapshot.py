@@ -0,0 +1,342 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+
+from graph import CoStarGraph
+
+MAGIC = b"DEGSNAP\0"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_NAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Sections every snapshot has, besides the _blob and _offsets of each
+# string table in STRING_TABLES
+SECTIONS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_people",
+    "person_order", "movie_order", "name_offsets", "name_people",
+    "components", "component_sizes",
+)
+STRING_TABLES = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years", "name_keys",
+)
+
+# Magic, version, length of the JSON header that follows
+PREAMBLE = struct.Struct("<8sII")
+
+
+def source_stamps(directory):
+    """
+    Return the (mtime in ns, size) of every CSV file in `directory`,
+    used to tell whether a snapshot is still up to date.
+    """
+    stamps = {}
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        stamps[name] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def save_snapshot(directory, stamps, graph, people, movies):
+    """
+    Write `graph` and the names, births, titles and years in `people`
+    and `movies` to a snapshot next to the CSV files in `directory`.
+    """
+    person_ids = graph.person_ids
+    movie_ids = graph.movie_ids
+
+    # One entry per distinct lowercase name, pointing at its people
+    by_name = {}
+    for person, person_id in enumerate(person_ids):
+        by_name.setdefault(people[person_id]["name"].lower(), []).append(person)
+    name_keys = sorted(by_name)
+    name_offsets = array("q", [0])
+    name_people = array("i")
+    for name in name_keys:
+        name_people.extend(by_name[name])
+        name_offsets.append(len(name_people))
+
+    sections = [
+        ("person_offsets", graph.person_offsets),
+        ("person_movies", graph.person_movies),
+        ("movie_offsets", graph.movie_offsets),
+        ("movie_people", graph.movie_people),
+        ("person_order", array("i", sorted(range(len(person_ids)), key=person_ids.__getitem__))),
+        ("movie_order", array("i", sorted(range(len(movie_ids)), key=movie_ids.__getitem__))),
+        ("name_offsets", name_offsets),
+        ("name_people", name_people),
+        ("components", graph.components),
+        ("component_sizes", graph.component_sizes),
+    ]
+    for label, strings in (
+        ("person_ids", person_ids),
+        ("person_names", [people[person_id]["name"] for person_id in person_ids]),
+        ("person_births", [people[person_id]["birth"] for person_id in person_ids]),
+        ("movie_ids", movie_ids),
+        ("movie_titles", [movies[movie_id]["title"] for movie_id in movie_ids]),
+        ("movie_years", [movies[movie_id]["year"] for movie_id in movie_ids]),
+        ("name_keys", name_keys),
+    ):
+        blob, offsets = pack_strings(strings)
+        sections.append((f"{label}_blob", blob))
+        sections.append((f"{label}_offsets", offsets))
+
+    # Lay out sections after the header, each aligned to 8 bytes
+    layout = {}
+    position = 0
+    for label, data in sections:
+        data = memoryview(data)
+        layout[label] = [position, len(data), data.format]
+        position += align(data.nbytes)
+    header = json.dumps({"sources": stamps, "sections": layout}).encode("utf-8")
+    start = align(PREAMBLE.size + len(header))
+
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        f.write(bytes(start - PREAMBLE.size - len(header)))
+        for label, data in sections:
+            data = memoryview(data).cast("B")
+            f.write(data)
+            f.write(bytes(align(len(data)) - len(data)))
+    os.replace(partial, path)
+
+
+def load_snapshot(directory, stamps):
+    """
+    Memory-map the snapshot in `directory` and return
+    (graph, people, movies, names), or None if there is no snapshot,
+    it has another version, the CSV files changed since it was made, or
+    it is damaged (see `read_sections`).
+    """
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    sections = read_sections(buffer, stamps)
+    if sections is None:
+        return None
+
+    def strings(label):
+        return StringTable(sections[f"{label}_blob"], sections[f"{label}_offsets"])
+
+    person_ids = strings("person_ids")
+    movie_ids = strings("movie_ids")
+    graph = CoStarGraph(
+        person_ids, movie_ids,
+        sections["person_offsets"], sections["person_movies"],
+        sections["movie_offsets"], sections["movie_people"],
+        person_index=SortedIndex(person_ids, sections["person_order"]),
+        movie_index=SortedIndex(movie_ids, sections["movie_order"]),
+        components=sections["components"],
+        component_sizes=sections["component_sizes"],
+    )
+    people = Records(graph.person_index, {
+        "name": strings("person_names"),
+        "birth": strings("person_births"),
+    })
+    movies = Records(graph.movie_index, {
+        "title": strings("movie_titles"),
+        "year": strings("movie_years"),
+    })
+    names = Names(
+        strings("name_keys"), sections["name_offsets"],
+        sections["name_people"], person_ids
+    )
+    return graph, people, movies, names
+
+
+def read_sections(buffer, stamps):
+    """
+    Return a dictionary of typed memoryviews of the sections of the
+    snapshot in `buffer`, or None if it has another version, was made
+    from other CSV files, or is damaged or cut short.
+    """
+    try:
+        magic, version, length = PREAMBLE.unpack_from(buffer)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        if PREAMBLE.size + length > len(buffer):
+            return None
+        header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + length]))
+        if header["sources"] != stamps:
+            return None
+
+        start = align(PREAMBLE.size + length)
+        view = memoryview(buffer)
+        sections = {}
+        for label, (position, size, typecode) in header["sections"].items():
+            end = start + position + size * struct.calcsize(typecode)
+            if end > len(buffer):
+                return None
+            sections[label] = view[start + position:end].cast(typecode)
+        for label in SECTIONS:
+            if label not in sections:
+                return None
+        for label in STRING_TABLES:
+            if f"{label}_blob" not in sections or f"{label}_offsets" not in sections:
+                return None
+    except (struct.error, ValueError, KeyError, TypeError):
+        return None
+    return sections
+
+
+def pack_strings(strings):
+    """
+    Encode `strings` into one UTF-8 blob and an array of offsets,
+    where string i is blob[offsets[i]:offsets[i + 1]].
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("q", [0])
+    total = 0
+    for data in encoded:
+        total += len(data)
+        offsets.append(total)
+    return b"".join(encoded), offsets
+
+
+def align(size):
+    return (size + 7) & ~7
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as a blob and offsets.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class SortedIndex(Mapping):
+    """
+    Maps each string in `table` to its position, by binary search
+    over `order`, the positions sorted by their strings.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+        self.keys_in_order = SortedKeys(table, order)
+
+    def __getitem__(self, key):
+        i = bisect.bisect_left(self.keys_in_order, key)
+        if i == len(self.order) or self.keys_in_order[i] != key:
+            raise KeyError(key)
+        return self.order[i]
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+
+class SortedKeys():
+    """
+    The strings of `table` in the sorted order given by `order`.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.table[self.order[i]]
+
+
+class Records(Mapping):
+    """
+    Maps ids to dictionaries of fields, read on demand from the
+    per-field string tables. Records set later are kept in `added`.
+    """
+
+    def __init__(self, index, fields):
+        self.index = index
+        self.fields = fields
+        self.added = {}
+
+    def __getitem__(self, key):
+        if key in self.added:
+            return self.added[key]
+        i = self.index[key]
+        return {field: table[i] for field, table in self.fields.items()}
+
+    def __setitem__(self, key, record):
+        self.added[key] = record
+
+    def __iter__(self):
+        yield from self.index
+        yield from self.added
+
+    def __len__(self):
+        return len(self.index) + len(self.added)
+
+
+class Names(Mapping):
+    """
+    Maps lowercase names to the set of person_ids with that name.
+    Sets assigned later are kept in `added` and replace the stored ones.
+    """
+
+    def __init__(self, keys, offsets, people, person_ids):
+        self.keys = keys
+        self.offsets = offsets
+        self.people = people
+        self.person_ids = person_ids
+        self.added = {}
+
+    def __getitem__(self, name):
+        if name in self.added:
+            return self.added[name]
+        i = self.find(name)
+        if i is None:
+            raise KeyError(name)
+        return {
+            self.person_ids[self.people[j]]
+            for j in range(self.offsets[i], self.offsets[i + 1])
+        }
+
+    def __setitem__(self, name, person_ids):
+        self.added[name] = person_ids
+
+    def __iter__(self):
+        yield from self.keys
+        for name in self.added:
+            if self.find(name) is None:
+                yield name
+
+    def __len__(self):
+        return len(self.keys) + sum(
+            1 for name in self.added if self.find(name) is None
+        )
+
+    def find(self, name):
+        """
+        Returns the position of `name` among the stored names, or None.
+        """
+        i = bisect.bisect_left(self.keys, name)
+        if i == len(self.keys) or self.keys[i] != name:
+            return None
+        return i
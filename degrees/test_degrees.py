@@ -0,0 +1,310 @@
+import http.client
+import random
+import shutil
+import threading
+
+import pytest
+
+from benchmark import generate_graph
+from degrees import *
+import degrees
+from nameindex import NameIndex
+from snapshot import SNAPSHOT_NAME
+
+
+def test_append_data_snapshot(tmp_path):
+    """Test appending stars that merge components of a memory-mapped graph"""
+    shutil.copytree("small", tmp_path / "small")
+    load_data(tmp_path / "small", compact=True)
+    load_data(tmp_path / "small", compact=True)
+    assert isinstance(degrees.graph.components, memoryview)
+    assert not connected("914612", "102")
+
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new" / "stars.csv").write_text("person_id,movie_id\n914612,112384\n")
+    append_data(tmp_path / "new")
+    assert connected("914612", "102")
+    assert len(shortest_path("914612", "102")) == 1
+
+
+def test_add_person_indexes_names_once():
+    """Test that a new person with a known name is not indexed twice"""
+    for compact in [False, True]:
+        load_data("small", compact=compact, snapshot=False)
+        get_name_index()
+        add_person("999", "Tom Hanks", "1956")
+        add_person("998", "Tom Holland", "1996")
+        assert get_name_index().prefix("tom h") == ["tom hanks", "tom holland"]
+        assert degrees.names["tom hanks"] == {"158", "999"}
+
+
+def test_shortest_path_engines(tmp_path):
+    """Test that every search finds paths of the same length as plain BFS"""
+    rng = random.Random(50)
+    generate_graph(tmp_path, 300, 150, 1, rng)
+    load_data(tmp_path)
+    pairs = [rng.sample(list(degrees.people), 2) for _ in range(200)]
+    expected = [shortest_path(source, target) for source, target in pairs]
+    assert max(map(len, expected)) > 3
+
+    def lengths(paths):
+        return [len(path) for path in paths]
+
+    def check(path, source, target):
+        for movie_id, person_id in path:
+            assert (movie_id, person_id) in neighbors_for_person(source)
+            source = person_id
+        assert source == target
+
+    found = [shortest_path(source, target, bidirectional=True) for source, target in pairs]
+    assert lengths(found) == lengths(expected)
+    for snapshot in [False, True]:
+        load_data(tmp_path, compact=True, snapshot=snapshot)
+        for bidirectional in [True, False]:
+            found = [shortest_path(source, target, bidirectional) for source, target in pairs]
+            assert lengths(found) == lengths(expected)
+            for path, (source, target) in zip(found, pairs):
+                check(path, source, target)
+
+
+def test_snapshot(tmp_path):
+    """Test that a snapshot loads the same data and is rebuilt when a CSV file changes"""
+    shutil.copytree("small", tmp_path, dirs_exist_ok=True)
+    load_data(tmp_path)
+    expected = {person_id: dict(person) for person_id, person in degrees.people.items()}
+    paths = {person_id: shortest_path("102", person_id, bidirectional=True) for person_id in expected}
+
+    load_data(tmp_path, compact=True)
+    assert load_stats["rows"] > 0
+    load_data(tmp_path, compact=True)
+    assert load_stats["rows"] == 0
+    for person_id, person in expected.items():
+        assert degrees.people[person_id]["name"] == person["name"]
+        assert degrees.people[person_id]["birth"] == person["birth"]
+        assert len(shortest_path("102", person_id) or []) == len(paths[person_id] or [])
+    assert degrees.movies["112384"]["title"] == "Apollo 13"
+    assert degrees.names["tom hanks"] == {"158"}
+
+    with open(tmp_path / "people.csv", "a") as f:
+        f.write('999,"Tom Hanks",1956\n')
+    load_data(tmp_path, compact=True)
+    assert load_stats["rows"] > 0
+    load_data(tmp_path, compact=True)
+    assert load_stats["rows"] == 0
+    assert degrees.names["tom hanks"] == {"158", "999"}
+    assert not connected("999", "158")
+
+
+def test_reload_after_change(tmp_path):
+    """Test that reloading after a CSV file changes starts from scratch"""
+    shutil.copytree("small", tmp_path, dirs_exist_ok=True)
+    load_data(tmp_path, compact=True)
+    load_data(tmp_path, compact=True)
+    with open(tmp_path / "people.csv", "a") as f:
+        f.write('999,"New Person",2000\n')
+    for rows in [True, False]:
+        load_data(tmp_path, compact=True)
+        assert (load_stats["rows"] > 0) == rows
+        assert len(degrees.people) == 17
+        assert len(degrees.graph.person_ids) == 17
+        assert sorted(size for size in degrees.component_sizes if size) == [1, 1, 15]
+    load_data(tmp_path)
+    assert len(degrees.people) == 17
+    assert degrees.graph is None
+
+
+def test_damaged_snapshot(tmp_path):
+    """Test that a damaged or cut short snapshot is rebuilt from the CSV files"""
+    shutil.copytree("small", tmp_path, dirs_exist_ok=True)
+    load_data(tmp_path, compact=True)
+    snapshot = (tmp_path / SNAPSHOT_NAME).read_bytes()
+    for damaged in [b"", snapshot[:7], snapshot[:100], snapshot[:-8],
+                    snapshot[:20] + b"x" * (len(snapshot) - 20)]:
+        (tmp_path / SNAPSHOT_NAME).write_bytes(damaged)
+        load_data(tmp_path, compact=True)
+        assert load_stats["rows"] > 0
+        assert len(degrees.people) == 16
+        load_data(tmp_path, compact=True)
+        assert load_stats["rows"] == 0
+        assert connected("102", "144")
+
+
+def test_components(tmp_path):
+    """Test connected components in every mode"""
+    shutil.copytree("small", tmp_path, dirs_exist_ok=True)
+    for compact, snapshot in [(False, False), (True, False), (True, True)]:
+        load_data(tmp_path, compact=compact, snapshot=snapshot)
+        assert connected("102", "144")
+        assert not connected("102", "914612")
+        assert shortest_path("102", "914612") is None
+        assert sorted(size for size in degrees.component_sizes if size) == [1, 15]
+
+
+def test_append_data(tmp_path):
+    """Test appending people, movies and stars in every mode"""
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new" / "people.csv").write_text('id,name,birth\n1000,"New Person",2000\n102,"Kevin Bacon",1958\n')
+    (tmp_path / "new" / "movies.csv").write_text('id,title,year\n2000,"New Movie",2020\n')
+    (tmp_path / "new" / "stars.csv").write_text(
+        "person_id,movie_id\n1000,2000\n914612,2000\n914612,112384\n1001,2000\n"
+    )
+    for compact, snapshot in [(False, False), (True, False), (True, True)]:
+        shutil.rmtree(tmp_path / "small", ignore_errors=True)
+        shutil.copytree("small", tmp_path / "small")
+        load_data(tmp_path / "small", compact=compact, snapshot=snapshot)
+        load_data(tmp_path / "small", compact=compact, snapshot=snapshot)
+        append_data(tmp_path / "new")
+        assert load_stats["rows"] == 7
+        assert degrees.people["1000"]["name"] == "New Person"
+        assert degrees.movies["2000"]["title"] == "New Movie"
+        assert degrees.names["new person"] == {"1000"}
+        assert "1001" not in degrees.people
+        assert connected("1000", "102")
+        assert [person_id for _, person_id in shortest_path("1000", "102")] == ["914612", "102"]
+        assert sorted(size for size in degrees.component_sizes if size) == [17]
+
+
+def test_run_batch():
+    """Test that batch answers come back in input order with several workers"""
+    load_data("small", compact=True, snapshot=False)
+    names = sorted(person["name"] for person in degrees.people.values())
+    lines = [f"{source}\t{target}\n" for source in names for target in names]
+    lines[5:5] = ["\n", "not a query\n", '{"source": "Kevin Bacon", "target": "Nobody"}\n']
+
+    expected = io.StringIO()
+    run_batch(lines, expected)
+    results = [json.loads(line) for line in expected.getvalue().splitlines()]
+    assert len(results) == len(names) ** 2 + 2
+    assert results[5] == {"error": "Bad query: not a query"}
+    assert results[6]["error"] == "Person not found: Nobody"
+    assert [(result["source"], result["target"]) for result in results[7:]] == [
+        (source, target) for source in names for target in names
+    ][5:]
+
+    output = io.StringIO()
+    run_batch(lines, output, workers=2)
+    assert output.getvalue() == expected.getvalue()
+
+
+def test_run_batch_spawn(tmp_path, monkeypatch):
+    """Test that workers started without fork see appended data too"""
+    (tmp_path / "stars.csv").write_text("person_id,movie_id\n914612,112384\n")
+    load_data("small", compact=True, snapshot=False)
+    append_data(tmp_path)
+    lines = ["Kevin Bacon\tEmma Watson\n", "Emma Watson\tTom Cruise\n"] * 100
+
+    expected = io.StringIO()
+    run_batch(lines, expected)
+    assert json.loads(expected.getvalue().splitlines()[1])["degrees"] == 2
+
+    monkeypatch.setattr(degrees.multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    output = io.StringIO()
+    run_batch(lines, output, workers=2)
+    assert output.getvalue() == expected.getvalue()
+
+
+def test_bfs_tree(tmp_path):
+    """Test degree histograms and paths read from cached breadth-first trees"""
+    (tmp_path / "stars.csv").write_text("person_id,movie_id\n914612,112384\n")
+    for compact in [False, True]:
+        load_data("small", compact=compact, snapshot=False)
+        assert degree_histogram("102") == {0: 1, 1: 6, 2: 5, 3: 3}
+        assert degree_histogram("914612") == {0: 1}
+        assert "102" in trees
+
+        distances, _ = trees["102"]
+        for person_id in degrees.people:
+            path = shortest_path("102", person_id)
+            if person_id == "914612":
+                assert path is None
+                continue
+            assert path == path_in_tree(trees["102"], person_id)
+            assert len(path) == distances[person_id]
+            assert len(path) == len(shortest_path("102", person_id, bidirectional=True))
+        assert bfs_tree("102") is trees["102"]
+        assert "144" not in trees
+        bfs_tree("144", cache=False)
+        assert "144" not in trees
+
+        append_data(tmp_path)
+        assert trees == {}
+        assert degree_histogram("102") == {0: 1, 1: 7, 2: 5, 3: 3}
+        assert len(shortest_path("102", "914612")) == 1
+
+
+def test_name_index():
+    """Test prefix and fuzzy lookups, including names added later"""
+    index = NameIndex(["kevin bacon", "tom cruise", "tom hanks", "tommy lee jones"])
+    assert index.prefix("tom") == ["tom cruise", "tom hanks", "tommy lee jones"]
+    assert index.prefix("tom ", limit=1) == ["tom cruise"]
+    matches = index.fuzzy("kevn bacon")
+    assert matches[0][1] == "kevin bacon"
+    assert [score for score, _ in matches] == sorted((score for score, _ in matches), reverse=True)
+    assert index.fuzzy("") == []
+    index.add("kevin bacons")
+    assert [name for _, name in index.fuzzy("kevin bacons", 2)] == ["kevin bacons", "kevin bacon"]
+    assert index.search("Tom Hanks")[0] == "tom hanks"
+    assert index.search("tom hnks")[0] == "tom hanks"
+
+
+def test_candidates_for_name():
+    """Test ranking ambiguous and misspelled names"""
+    for compact in [False, True]:
+        load_data("small", compact=compact, snapshot=False)
+        add_person("999", "Tom Hanks", "1990")
+        assert candidates_for_name("Tom Hanks")[:2] == ["158", "999"]
+        assert candidates_for_name("Tom Hanks", by="birth")[:2] == ["999", "158"]
+        assert candidates_for_name("tom hnks")[:2] == ["158", "999"]
+        assert candidates_for_name("tom", limit=2) == ["129", "158"]
+        assert candidates_for_name("Kevn Bacon")[0] == "102"
+        assert suggest_names("Kevn Bacon")[0] == "Kevin Bacon"
+        assert rank_candidates(["163", "102", "129"]) == ["102", "129", "163"]
+        assert rank_candidates(["163", "102", "129"], by="birth") == ["129", "102", "163"]
+        with pytest.raises(ValueError):
+            rank_candidates(["102"], by="age")
+
+        result = query("Tom Hanks", "Kevin Bacon")
+        assert result["source_candidates"] == ["158", "999"]
+        assert result["degrees"] == 1
+        result = query("Kevn Bacon", "Tom Hanks")
+        assert result["error"] == "Person not found: Kevn Bacon"
+        assert result["suggestions"][0] == "Kevin Bacon"
+
+
+def test_serve():
+    """Test answering GET and POST requests over HTTP"""
+    load_data("small", compact=True, snapshot=False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QueryHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    def request(method, path, body=None, headers={}):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        result = response.status, response.read().decode("utf-8")
+        connection.close()
+        return result
+
+    try:
+        status, body = request("GET", "/?source=Kevin+Bacon&target=Tom+Hanks")
+        assert status == 200
+        assert json.loads(body)["degrees"] == 1
+        status, body = request("GET", "/?source=Kevin+Bacon")
+        assert status == 400
+
+        lines = "Kevin Bacon\tTom Hanks\n\nnot a query\nKevin Bacon\tEmma Watson\n"
+        status, body = request("POST", "/", lines.encode("utf-8"))
+        assert status == 200
+        results = [json.loads(line) for line in body.splitlines()]
+        assert [result.get("degrees") for result in results] == [1, None, None]
+        assert results[1] == {"error": "Bad query: not a query"}
+
+        for length in ["abc", "-5"]:
+            status, body = request("POST", "/", b"", {"Content-Length": length})
+            assert status == 400
+            assert "error" in json.loads(body)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +10,16 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # Number of nodes in the frontier for each state
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +28,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard(node.state)
             return node
 
+    def discard(self, state):
+        count = self.states[state] - 1
+        if count:
+            self.states[state] = count
+        else:
+            del self.states[state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +46,29 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard(node.state)
             return node
+
+
+def join_paths(forward, backward, person, action, other):
+    """
+    Returns the (action, state) path through the link `action` from
+    `person`, reached by the search from the source, to `other`, reached
+    by the search from the target. `forward` and `backward` map each
+    reached state to (action, state, depth) towards their starting
+    point, or None for the starting point itself.
+    """
+    pairs = []
+    while forward[person] is not None:
+        step, previous, _ = forward[person]
+        pairs.append((step, person))
+        person = previous
+    pairs.reverse()
+
+    pairs.append((action, other))
+    while backward[other] is not None:
+        step, following, _ = backward[other]
+        pairs.append((step, following))
+        other = following
+    return pairs
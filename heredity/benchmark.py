@@ -0,0 +1,114 @@
+import argparse
+import os
+import random
+import time
+
+import heredity
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the heredity inference methods on generated families."
+    )
+    parser.add_argument("--sizes", default="3,5,7,10,100,1000,10000",
+                        help="comma-separated numbers of people to generate")
+    parser.add_argument("--enumerate-limit", type=int, default=7,
+                        help="largest family to enumerate by brute force")
+    parser.add_argument("--vectorize-limit", type=int, default=10,
+                        help="largest family to enumerate in blocks with NumPy")
+    parser.add_argument("--prune-limit", type=int, default=12,
+                        help="largest family to enumerate gene assignments for")
+    parser.add_argument("--epsilon", type=float, default=1e-12,
+                        help="probability of the partial assignments pruned")
+    parser.add_argument("--sample-limit", type=int, default=1000,
+                        help="largest family to sample")
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="samples for Gibbs sampling and likelihood weighting")
+    parser.add_argument("--observed", type=float, default=0.5,
+                        help="share of people whose trait is known")
+    parser.add_argument("--seed", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in map(int, args.sizes.split(",")):
+        people = generate_family(size, rng, args.observed)
+        benchmark(people, args)
+
+
+def generate_family(n_people, rng, observed=0.5):
+    """
+    Return a family of `n_people` people in the format of `load_data`.
+    Each child has a parent already in the family and a partner of
+    theirs from outside it, so the family tree has no loops.
+    """
+    people = {}
+    partners = {}
+
+    def add(mother, father):
+        name = f"Person {len(people)}"
+        trait = None
+        if rng.random() < observed:
+            trait = rng.random() < 0.2
+        people[name] = {"name": name, "mother": mother, "father": father, "trait": trait}
+        return name
+
+    add(None, None)
+    while len(people) < n_people:
+        parent = rng.choice(list(people))
+        if parent not in partners:
+            if len(people) + 2 > n_people:
+                add(None, None)
+                continue
+            partners[parent] = add(None, None)
+        add(parent, partners[parent])
+    return people
+
+
+def benchmark(people, args):
+    """
+    Time each method on `people` and check that they agree.
+    """
+    print(f"{len(people)} people")
+    start = time.perf_counter()
+    eliminated = heredity.eliminate_probabilities(people)
+    print(f"  {'eliminate':>11}: {time.perf_counter() - start:.4f}s")
+
+    for method, function, arguments, limit in (
+        ("prune", heredity.prune_probabilities, (0,), args.prune_limit),
+        (f"prune {args.epsilon:g}", heredity.prune_probabilities, (args.epsilon,),
+         args.prune_limit),
+        ("vectorize", heredity.vectorize_probabilities, (), args.vectorize_limit),
+        ("enumerate", heredity.enumerate_probabilities, (), args.enumerate_limit),
+        (f"parallel ({os.cpu_count()} processes)", heredity.parallel_probabilities, (),
+         args.enumerate_limit),
+        ("gibbs", heredity.sample_probabilities, ("gibbs", args.samples),
+         args.sample_limit),
+        ("weighting", heredity.sample_probabilities, ("weighting", args.samples),
+         args.sample_limit),
+    ):
+        if len(people) > limit:
+            print(f"  {method:>11}: skipped")
+            continue
+        start = time.perf_counter()
+        probabilities = function(people, *arguments)
+        elapsed = time.perf_counter() - start
+        if isinstance(probabilities, tuple):
+            probabilities, _ = probabilities
+        print(f"  {method:>11}: {elapsed:.4f}s, largest difference "
+              f"{difference(eliminated, probabilities):.2e}")
+
+
+def difference(expected, probabilities):
+    """
+    Return the largest difference between two sets of probabilities.
+    """
+    return max(
+        abs(expected[person][field][value] - probabilities[person][field][value])
+        for person in expected
+        for field in expected[person]
+        for value in expected[person][field]
+    )
+
+
+if __name__ == "__main__":
+    main()
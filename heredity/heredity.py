@@ -1,6 +1,9 @@
+import argparse
+import concurrent.futures
 import csv
+import heapq
 import itertools
-import sys
+import os
 import numpy as np
 
 PROBS = {
@@ -37,16 +40,85 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Ways of computing the probabilities
+METHODS = ("eliminate", "enumerate", "vectorize", "prune", "parallel", "gibbs", "weighting")
+
+# Samples drawn in all and independent chains when sampling, the share of
+# each Gibbs chain discarded before counting, and the z-score of the 95%
+# confidence intervals printed
+SAMPLES = 100000
+CHAINS = 8
+BURN_IN = 0.1
+CONFIDENCE = 1.96
+
+# Family of the shards added up in a parallel worker process
+shard_people = None
+
+# Assignments of genes and traits evaluated at a time by `vectorize_probabilities`
+ASSIGNMENT_BLOCK = 1 << 16
+
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for a family."
+    )
+    parser.add_argument("data", help="CSV file of name, mother, father, trait")
+    parser.add_argument("--method", choices=METHODS, default="eliminate",
+                        help="eliminate (exact, fast), enumerate (brute force), "
+                             "vectorize (brute force over blocks in NumPy), "
+                             "prune (gene assignments above --epsilon), "
+                             "parallel (brute force on --processes processes), "
+                             "or gibbs or weighting (estimates from --samples samples)")
+    parser.add_argument("--epsilon", type=float, default=0,
+                        help="with prune, skip partial assignments at most "
+                             "this probable (default 0, exact)")
+    parser.add_argument("--processes", type=int,
+                        help="with parallel, processes to use (default one per "
+                             "CPU); with gibbs or weighting, default 1")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"with gibbs or weighting, samples to draw in all (default {SAMPLES})")
+    parser.add_argument("--chains", type=int, default=CHAINS,
+                        help=f"with gibbs or weighting, independent chains (default {CHAINS})")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    people = load_data(args.data)
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    errors = None
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    if args.method == "enumerate":
+        probabilities = enumerate_probabilities(people)
+    elif args.method == "vectorize":
+        probabilities = vectorize_probabilities(people)
+    elif args.method == "prune":
+        probabilities = prune_probabilities(people, args.epsilon)
+    elif args.method == "parallel":
+        probabilities = parallel_probabilities(people, args.processes)
+    elif args.method in ("gibbs", "weighting"):
+        probabilities, errors = sample_probabilities(
+            people, args.method, args.samples, args.chains,
+            args.processes or 1, args.seed
+        )
+    else:
+        probabilities = eliminate_probabilities(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {CONFIDENCE * errors[person][field][value]:.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a dictionary of zero gene and trait probabilities for everyone.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -61,17 +133,22 @@ def main():
         for person in people
     }
 
+
+def enumerate_probabilities(people):
+    """
+    Compute everyone's gene and trait probabilities by adding up
+    `joint_probability` over every assignment of genes and traits
+    consistent with the known traits.
+    """
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
 
         # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
+        if fails_evidence(people, have_trait):
             continue
 
         # Loop over all sets of people who might have the gene
@@ -84,15 +161,84 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def fails_evidence(people, have_trait):
+    """
+    Return True if `have_trait` disagrees with anyone's known trait.
+    """
+    return any(
+        (people[person]["trait"] is not None and
+         people[person]["trait"] != (person in have_trait))
+        for person in people
+    )
+
+
+def parallel_probabilities(people, processes=None, shards=None):
+    """
+    Compute everyone's gene and trait probabilities like
+    `enumerate_probabilities`, with the (have_trait, one_gene) pairs
+    dealt out to `shards` shards (by default four per process) added up
+    on a pool of `processes` processes (by default one per CPU). Each
+    shard returns its own unnormalized table, and the tables are added
+    together in order before normalizing.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if shards is None:
+        shards = 4 * processes
+    names = set(people)
+    pairs = [
+        (have_trait, one_gene)
+        for have_trait in powerset(names)
+        if not fails_evidence(people, have_trait)
+        for one_gene in powerset(names)
+    ]
+    # Dealt out in turn, as pairs with smaller one_gene sets take longer
+    tasks = [pairs[i::shards] for i in range(shards)]
+
+    if processes == 1:
+        set_shard_people(people)
+        partials = map(enumerate_shard, tasks)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            processes, initializer=set_shard_people, initargs=(people,)
+        )
+        with executor:
+            partials = list(executor.map(enumerate_shard, tasks))
+
+    probabilities = empty_probabilities(people)
+    for partial in partials:
+        for person in probabilities:
+            for field in probabilities[person]:
+                for value in probabilities[person][field]:
+                    probabilities[person][field][value] += partial[person][field][value]
+    normalize(probabilities)
+    return probabilities
+
+
+def set_shard_people(people):
+    """
+    Set the family whose shards this process adds up.
+    """
+    global shard_people
+    shard_people = people
+
+
+def enumerate_shard(pairs):
+    """
+    Return the unnormalized probabilities of `shard_people` added up
+    over every two_genes set for each (have_trait, one_gene) in `pairs`.
+    """
+    people = shard_people
+    probabilities = empty_probabilities(people)
+    names = set(people)
+    for have_trait, one_gene in pairs:
+        for two_genes in powerset(names - one_gene):
+            p = joint_probability(people, one_gene, two_genes, have_trait)
+            update(probabilities, one_gene, two_genes, have_trait, p)
+    return probabilities
 
 
 def load_data(filename):
@@ -300,5 +446,572 @@ def normalize(probabilities):
         for trait in probabilities[person]["trait"]:
             probabilities[person]["trait"][trait] = probabilities[person]["trait"][trait] / sum_traits
 
+def inheritance_table():
+    """
+    Return an array where [child, mother, father] is the probability
+    that a child has `child` copies of the gene when its mother and
+    father have `mother` and `father` copies.
+    """
+    table = np.zeros((3, 3, 3))
+    for mother in range(3):
+        for father in range(3):
+            from_mother = get_gene(mother)
+            from_father = get_gene(father)
+            table[0, mother, father] = (1 - from_mother) * (1 - from_father)
+            table[1, mother, father] = (from_mother * (1 - from_father) +
+                                        (1 - from_mother) * from_father)
+            table[2, mother, father] = from_mother * from_father
+    return table
+
+
+def joint_probabilities(people, genes, traits):
+    """
+    Compute the joint probability of many assignments at once, like
+    `joint_probability`. Row i of `genes` gives the number of copies of
+    the gene of each person in `people`, in order, and row i of
+    `traits` whether each has the trait.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    founders = [i for i, name in enumerate(names) if people[name]["father"] is None]
+    children = [i for i, name in enumerate(names) if people[name]["father"] is not None]
+    mothers = [index[people[names[i]]["mother"]] for i in children]
+    fathers = [index[people[names[i]]["father"]] for i in children]
+
+    prior = np.array([PROBS["gene"][count] for count in range(3)])
+    trait_table = np.array([
+        [PROBS["trait"][count][False], PROBS["trait"][count][True]]
+        for count in range(3)
+    ])
+    p = trait_table[genes, traits.astype(np.intp)].prod(axis=1)
+    p *= prior[genes[:, founders]].prod(axis=1)
+    p *= inheritance_table()[
+        genes[:, children], genes[:, mothers], genes[:, fathers]
+    ].prod(axis=1)
+    return p
+
+
+def vectorize_probabilities(people, block=ASSIGNMENT_BLOCK):
+    """
+    Compute everyone's gene and trait probabilities like
+    `enumerate_probabilities`, but numbering the assignments consistent
+    with the known traits and evaluating `block` of them at a time with
+    `joint_probabilities`, adding them up with array operations.
+    """
+    names = list(people)
+    n = len(names)
+    unknown = [i for i, name in enumerate(names) if people[name]["trait"] is None]
+    known = np.array([bool(people[name]["trait"]) for name in names])
+    gene_powers = 3 ** np.arange(n, dtype=np.int64)
+    trait_powers = 2 ** np.arange(len(unknown), dtype=np.int64)
+    gene_assignments = 3 ** n
+
+    # Sums of the joint probabilities for each person and value
+    genes_total = np.zeros((n, 3))
+    trait_total = np.zeros((n, 2))
+    for start in range(0, gene_assignments * 2 ** len(unknown), block):
+        codes = np.arange(start, min(start + block, gene_assignments * 2 ** len(unknown)),
+                          dtype=np.int64)
+        genes = (codes[:, np.newaxis] % gene_assignments // gene_powers) % 3
+        traits = np.repeat(known[np.newaxis, :], len(codes), axis=0)
+        traits[:, unknown] = (codes[:, np.newaxis] // gene_assignments // trait_powers) % 2 == 1
+
+        p = joint_probabilities(people, genes, traits)
+        for count in range(3):
+            genes_total[:, count] += p @ (genes == count)
+        trait_total[:, 0] += p @ ~traits
+        trait_total[:, 1] += p @ traits
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(names):
+        for count in range(3):
+            probabilities[name]["gene"][count] = float(genes_total[i, count])
+        probabilities[name]["trait"][False] = float(trait_total[i, 0])
+        probabilities[name]["trait"][True] = float(trait_total[i, 1])
+    normalize(probabilities)
+    return probabilities
+
+
+def parents_first(people):
+    """
+    Return the names in `people` ordered so that parents come before
+    their children.
+    """
+    order = []
+    placed = set()
+    for name in people:
+        stack = [name]
+        while stack:
+            person = stack[-1]
+            if person in placed:
+                stack.pop()
+                continue
+            waiting = [
+                parent for parent in (people[person]["mother"], people[person]["father"])
+                if parent is not None and parent not in placed
+            ]
+            if waiting:
+                stack.extend(waiting)
+            else:
+                placed.add(person)
+                order.append(person)
+                stack.pop()
+    return order
+
+
+def assignments(people, epsilon=0):
+    """
+    Yield (genes, p) for each assignment of gene counts to `people`,
+    as a dictionary from name to count, with `p` its joint probability
+    together with the known traits.
+
+    Assignments are built one person at a time, parents first, without
+    listing them in advance, and a partial assignment whose probability
+    is already at most `epsilon` is dropped with every assignment that
+    extends it (with the default of 0, only impossible ones).
+    """
+    order = parents_first(people)
+    n = len(order)
+    if n == 0:
+        yield {}, 1.0
+        return
+    position = {name: i for i, name in enumerate(order)}
+    parents = [
+        None if people[name]["father"] is None else
+        (position[people[name]["mother"]], position[people[name]["father"]])
+        for name in order
+    ]
+    evidence = [trait_likelihood(people[name]["trait"]).tolist() for name in order]
+    prior = [PROBS["gene"][count] for count in range(3)]
+    inheritance = inheritance_table().tolist()
+
+    # Depth-first search, where counts[i] is the count being tried for
+    # person i and partial[i] the probability of the people before them
+    counts = [-1] * n
+    partial = [1.0] * n
+    i = 0
+    while i >= 0:
+        counts[i] += 1
+        if counts[i] > 2:
+            i -= 1
+            continue
+        count = counts[i]
+        if parents[i] is None:
+            p = partial[i] * prior[count] * evidence[i][count]
+        else:
+            mother, father = parents[i]
+            p = partial[i] * inheritance[count][counts[mother]][counts[father]] * evidence[i][count]
+        if p <= epsilon:
+            continue
+        if i == n - 1:
+            yield dict(zip(order, counts)), p
+        else:
+            i += 1
+            partial[i] = p
+            counts[i] = -1
+
+
+def prune_probabilities(people, epsilon=0):
+    """
+    Compute everyone's gene and trait probabilities from the lazily
+    generated, pruned `assignments`. Only genes are enumerated: unknown
+    traits are added up from the chance of the trait given the genes.
+    """
+    probabilities = empty_probabilities(people)
+    for genes, p in assignments(people, epsilon):
+        for name, count in genes.items():
+            probabilities[name]["gene"][count] += p
+            trait = people[name]["trait"]
+            if trait is None:
+                has_trait = PROBS["trait"][count][True]
+                probabilities[name]["trait"][True] += p * has_trait
+                probabilities[name]["trait"][False] += p * (1 - has_trait)
+            else:
+                probabilities[name]["trait"][trait] += p
+    normalize(probabilities)
+    return probabilities
+
+
+def trait_likelihood(trait):
+    """
+    Return the probability of the known `trait` for 0, 1 and 2 copies
+    of the gene, or ones if the trait is unknown.
+    """
+    if trait is None:
+        return np.ones(3)
+    return np.array([PROBS["trait"][genes][trait] for genes in range(3)])
+
+
+def family_factors(people):
+    """
+    Return the list of (variables, table) factors whose product is the
+    probability of everyone's gene counts and known traits, where
+    variable i is the gene count of the i-th person in `people`.
+    """
+    index = {name: i for i, name in enumerate(people)}
+    inheritance = inheritance_table()
+    prior = np.array([PROBS["gene"][genes] for genes in range(3)])
+    factors = []
+    for name, person in people.items():
+        evidence = trait_likelihood(person["trait"])
+        if person["father"] is None:
+            factors.append(((index[name],), prior * evidence))
+        else:
+            factors.append((
+                (index[name], index[person["mother"]], index[person["father"]]),
+                inheritance * evidence[:, np.newaxis, np.newaxis]
+            ))
+    return factors
+
+
+def contract(factors, keep):
+    """
+    Return the product of (variables, table) `factors`, summed over
+    every variable not in `keep`, as a table over `keep` scaled to sum
+    to 1 (which keeps long products from underflowing).
+    """
+    labels = {}
+    operands = []
+    for variables, table in factors:
+        operands.append(table)
+        operands.append([labels.setdefault(variable, len(labels)) for variable in variables])
+    for variable in keep:
+        if variable not in labels:
+            operands.extend((np.ones(3), [labels.setdefault(variable, len(labels))]))
+    table = np.einsum(*operands, [labels[variable] for variable in keep])
+    return table / table.sum()
+
+
+def junction_tree(factors, n):
+    """
+    Eliminate `n` variables greedily, fewest neighbours first, and
+    return (cliques, parents, assigned): the variables of the clique
+    formed by each elimination (the eliminated variable first), the
+    clique each passes its messages to (None for the last of a
+    family), and the factors assigned to each clique.
+    """
+    neighbors = [set() for _ in range(n)]
+    for variables, _ in factors:
+        for variable in variables:
+            neighbors[variable].update(variables)
+            neighbors[variable].discard(variable)
+
+    # Elimination order, by degree with lazy deletion from a heap
+    heap = [(len(neighbors[variable]), variable) for variable in range(n)]
+    heapq.heapify(heap)
+    position = [None] * n
+    cliques = []
+    while heap:
+        degree, variable = heapq.heappop(heap)
+        if position[variable] is not None or degree != len(neighbors[variable]):
+            continue
+        position[variable] = len(cliques)
+        others = neighbors[variable]
+        cliques.append((variable, *sorted(others)))
+        for other in others:
+            neighbors[other].discard(variable)
+            neighbors[other].update(others - {other})
+            heapq.heappush(heap, (len(neighbors[other]), other))
+
+    parents = []
+    for clique in cliques:
+        later = [position[variable] for variable in clique[1:]]
+        parents.append(min(later) if later else None)
+    assigned = [[] for _ in cliques]
+    for variables, table in factors:
+        assigned[min(position[variable] for variable in variables)].append((variables, table))
+    return cliques, parents, assigned
+
+
+def eliminate_probabilities(people):
+    """
+    Compute everyone's gene and trait probabilities exactly, like
+    `enumerate_probabilities`, by passing messages over a junction
+    tree of the family instead of listing every assignment. Time grows
+    linearly with the number of people for families without many
+    marriages between relatives.
+    """
+    factors = family_factors(people)
+    cliques, parents, assigned = junction_tree(factors, len(people))
+    children = [[] for _ in cliques]
+    for i, parent in enumerate(parents):
+        if parent is not None:
+            children[parent].append(i)
+
+    # Messages from each clique to its parent, then back down to it
+    upward = [None] * len(cliques)
+    for i, clique in enumerate(cliques):
+        if parents[i] is not None:
+            incoming = [upward[child] for child in children[i]]
+            upward[i] = (clique[1:], contract(assigned[i] + incoming, clique[1:]))
+    downward = [None] * len(cliques)
+    for i in reversed(range(len(cliques))):
+        incoming = [upward[child] for child in children[i]]
+        if downward[i] is not None:
+            incoming.append(downward[i])
+        for k, child in enumerate(children[i]):
+            separator = cliques[child][1:]
+            others = incoming[:k] + incoming[k + 1:]
+            downward[child] = (separator, contract(assigned[i] + others, separator))
+
+    names = list(people)
+    probabilities = empty_probabilities(people)
+    for i, clique in enumerate(cliques):
+        incoming = [upward[child] for child in children[i]]
+        if downward[i] is not None:
+            incoming.append(downward[i])
+        genes = contract(assigned[i] + incoming, clique[:1])
+        name = names[clique[0]]
+        for count in range(3):
+            probabilities[name]["gene"][count] = float(genes[count])
+        trait = people[name]["trait"]
+        if trait is None:
+            has_trait = float(sum(genes[count] * PROBS["trait"][count][True] for count in range(3)))
+        else:
+            has_trait = float(trait)
+        probabilities[name]["trait"][True] = has_trait
+        probabilities[name]["trait"][False] = 1 - has_trait
+    return probabilities
+
+
+def family_arrays(people):
+    """
+    Return (names, mothers, fathers, log_evidence, has_trait) arrays
+    for sampling: the names parents first, the positions of each
+    person's parents (-1 for none), the log probability of their known
+    trait and the probability that they have the trait, for 0, 1 and
+    2 copies of the gene.
+    """
+    names = parents_first(people)
+    position = {name: i for i, name in enumerate(names)}
+    mothers = np.array([
+        -1 if people[name]["father"] is None else position[people[name]["mother"]]
+        for name in names
+    ], dtype=np.intp)
+    fathers = np.array([
+        -1 if people[name]["father"] is None else position[people[name]["father"]]
+        for name in names
+    ], dtype=np.intp)
+    with np.errstate(divide="ignore"):
+        log_evidence = np.log([trait_likelihood(people[name]["trait"]) for name in names])
+    has_trait = np.array([
+        [PROBS["trait"][count][True] for count in range(3)]
+        if people[name]["trait"] is None else [float(people[name]["trait"])] * 3
+        for name in names
+    ])
+    return names, mothers, fathers, log_evidence, has_trait
+
+
+def draw(probabilities, rng):
+    """
+    Return an array of gene counts drawn from `probabilities`, whose
+    first axis gives the probability of 0, 1 and 2 copies.
+    """
+    u = rng.random(probabilities.shape[1:])
+    return ((u >= probabilities[0]).astype(np.intp) +
+            (u >= probabilities[0] + probabilities[1]))
+
+
+def forward_sample(family, size, rng):
+    """
+    Return an (n, size) array of gene counts drawn from their prior,
+    parents first, ignoring the known traits.
+    """
+    _, mothers, fathers, _, _ = family
+    prior = np.array([PROBS["gene"][count] for count in range(3)])
+    inheritance = inheritance_table()
+    genes = np.empty((len(mothers), size), dtype=np.intp)
+    for i in range(len(mothers)):
+        if mothers[i] < 0:
+            genes[i] = draw(np.repeat(prior[:, np.newaxis], size, axis=1), rng)
+        else:
+            genes[i] = draw(inheritance[:, genes[mothers[i]], genes[fathers[i]]], rng)
+    return genes
+
+
+def weighting_run(task):
+    """
+    Return (genes, traits), the likelihood weighting estimates of each
+    chain of a task (family, samples per chain, chain seeds): (n, 3)
+    gene probabilities and (n,) trait probabilities per chain.
+    """
+    family, samples, seeds = task
+    _, _, _, log_evidence, has_trait = family
+    n = len(log_evidence)
+    estimates = []
+    for seed in seeds:
+        genes = forward_sample(family, samples, np.random.default_rng(seed))
+        people = np.arange(n)[:, np.newaxis]
+        log_weights = log_evidence[people, genes].sum(axis=0)
+        weights = np.exp(log_weights - log_weights.max())
+        weights /= weights.sum()
+        estimates.append((
+            np.stack([(genes == count) @ weights for count in range(3)], axis=1),
+            has_trait[people, genes] @ weights
+        ))
+    return estimates
+
+
+def gibbs_classes(mothers, fathers):
+    """
+    Color people so that no two of the same color are in each other's
+    Markov blanket (parents, children and children's other parents),
+    and return, for each color, (people, mother_links, father_links):
+    the people of that color, and (slot, child, other parent) arrays
+    for the children they are the mother or the father of, where
+    `slot` is the parent's position among `people`.
+    """
+    n = len(mothers)
+    blanket = [set() for _ in range(n)]
+    for child in range(n):
+        if mothers[child] >= 0:
+            family = (child, mothers[child], fathers[child])
+            for person in family:
+                blanket[person].update(family)
+    colors = [None] * n
+    classes = []
+    for person in range(n):
+        taken = {colors[other] for other in blanket[person] if other != person}
+        color = 0
+        while color in taken:
+            color += 1
+        colors[person] = color
+        if color == len(classes):
+            classes.append([])
+        classes[color].append(person)
+
+    result = []
+    for members in classes:
+        slot = {person: i for i, person in enumerate(members)}
+        links = ([], [])
+        for child in range(n):
+            if mothers[child] < 0:
+                continue
+            for role, (parent, other) in enumerate((
+                (mothers[child], fathers[child]), (fathers[child], mothers[child])
+            )):
+                if parent in slot:
+                    links[role].append((slot[parent], child, other))
+        result.append((
+            np.array(members, dtype=np.intp),
+            *(np.array(role, dtype=np.intp).reshape(-1, 3) for role in links)
+        ))
+    return result
+
+
+def gibbs_run(task):
+    """
+    Return (genes, traits) estimates, as in `weighting_run`, from
+    Gibbs sampling chains run side by side for a task (family, color
+    classes, sweeps per chain, sweeps to discard, chains, seed).
+
+    Each sweep redraws everyone's gene count given everyone else's,
+    a color class at a time, with the odds worked out in log space.
+    """
+    family, classes, sweeps, burn_in, chains, seed = task
+    _, mothers, fathers, log_evidence, has_trait = family
+    rng = np.random.default_rng(seed)
+    n = len(mothers)
+    with np.errstate(divide="ignore"):
+        log_prior = np.log([PROBS["gene"][count] for count in range(3)])
+        log_inheritance = np.log(inheritance_table())
+    counts = np.arange(3)[:, np.newaxis, np.newaxis]
+
+    genes = forward_sample(family, chains, rng)
+    gene_totals = np.zeros((3, n, chains))
+    trait_totals = np.zeros((n, chains))
+    people = np.arange(n)[:, np.newaxis]
+    for sweep in range(burn_in + sweeps):
+        for members, mother_links, father_links in classes:
+            # Log odds of each count for each member: (3, members, chains)
+            log_odds = np.empty((3, len(members), chains))
+            founders = mothers[members] < 0
+            log_odds[:, founders] = log_prior[:, np.newaxis, np.newaxis]
+            children = members[~founders]
+            log_odds[:, ~founders] = log_inheritance[
+                :, genes[mothers[children]], genes[fathers[children]]
+            ]
+            log_odds += log_evidence[members].T[:, :, np.newaxis]
+            for role, links in enumerate((mother_links, father_links)):
+                if not len(links):
+                    continue
+                slots, linked, others = links.T
+                child = genes[linked][np.newaxis]
+                other = genes[others][np.newaxis]
+                if role == 0:
+                    terms = log_inheritance[child, counts, other]
+                else:
+                    terms = log_inheritance[child, other, counts]
+                np.add.at(log_odds, (slice(None), slots), terms)
+
+            log_odds -= log_odds.max(axis=0)
+            odds = np.exp(log_odds)
+            genes[members] = draw(odds / odds.sum(axis=0), rng)
+
+        if sweep >= burn_in:
+            gene_totals += genes == counts
+            trait_totals += has_trait[people, genes]
+    return [
+        (gene_totals[:, :, chain].T / sweeps, trait_totals[:, chain] / sweeps)
+        for chain in range(chains)
+    ]
+
+
+def sample_probabilities(people, method="gibbs", samples=SAMPLES, chains=CHAINS,
+                         processes=1, seed=None):
+    """
+    Estimate everyone's gene and trait probabilities by sampling, and
+    return (probabilities, errors), where `errors` holds the standard
+    error of each estimate, from the spread between independent chains.
+
+    "gibbs" runs `chains` Gibbs sampling chains of `samples` / `chains`
+    sweeps each (after BURN_IN more); "weighting" draws `samples` /
+    `chains` gene assignments per chain from the prior and weights them
+    by the likelihood of the known traits. Weights and odds are kept in
+    log space, so large families do not underflow. Chains are split
+    between `processes` processes.
+    """
+    if chains < 2:
+        raise ValueError("at least 2 chains are needed to estimate errors")
+    family = family_arrays(people)
+    per_chain = max(1, samples // chains)
+    groups = np.array_split(np.arange(chains), min(processes, chains))
+    seeds = np.random.SeedSequence(seed).spawn(chains)
+    if method == "weighting":
+        run = weighting_run
+        tasks = [(family, per_chain, [seeds[chain] for chain in group]) for group in groups]
+    elif method == "gibbs":
+        run = gibbs_run
+        classes = gibbs_classes(family[1], family[2])
+        burn_in = int(per_chain * BURN_IN)
+        tasks = [
+            (family, classes, per_chain, burn_in, len(group), seeds[group[0]])
+            for group in groups
+        ]
+    else:
+        raise ValueError(f"unknown sampling method {method!r}")
+
+    if processes == 1:
+        results = list(map(run, tasks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(run, tasks))
+    genes = np.array([estimate[0] for result in results for estimate in result])
+    traits = np.array([estimate[1] for result in results for estimate in result])
+
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
+    for i, name in enumerate(family[0]):
+        for count in range(3):
+            probabilities[name]["gene"][count] = float(genes[:, i, count].mean())
+            errors[name]["gene"][count] = float(genes[:, i, count].std(ddof=1) / np.sqrt(chains))
+        probabilities[name]["trait"][True] = float(traits[:, i].mean())
+        probabilities[name]["trait"][False] = 1 - float(traits[:, i].mean())
+        errors[name]["trait"][True] = errors[name]["trait"][False] = float(
+            traits[:, i].std(ddof=1) / np.sqrt(chains)
+        )
+    return probabilities, errors
+
+
 if __name__ == "__main__":
     main()
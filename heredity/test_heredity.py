@@ -11,3 +11,97 @@ def test_joint_probability():
     
     assert joint_probability(people, {"Harry"}, {"James"}, {"James"}) == 0.0026643247488
 
+
+def test_joint_probabilities():
+    """Test joint probabilities of many assignments at once against joint_probability"""
+    people = {
+        'Harry': {'name': 'Harry', 'mother': 'Lily', 'father': 'James', 'trait': None},
+        'James': {'name': 'James', 'mother': None, 'father': None, 'trait': True},
+        'Lily': {'name': 'Lily', 'mother': None, 'father': None, 'trait': False}
+        }
+    genes = np.array([[1, 2, 0], [0, 0, 0]])
+    traits = np.array([[False, True, False], [True, False, False]])
+    expected = [0.0026643247488, joint_probability(people, set(), set(), {"Harry"})]
+    assert np.allclose(joint_probabilities(people, genes, traits), expected, rtol=1e-12)
+
+
+def assert_same(expected, probabilities):
+    for person in expected:
+        for field in expected[person]:
+            for value in expected[person][field]:
+                assert abs(expected[person][field][value] - probabilities[person][field][value]) < 1e-12
+
+
+def test_eliminate_probabilities():
+    """Test exact inference by elimination against enumeration"""
+    for i in range(3):
+        people = load_data(f"data/family{i}.csv")
+        assert_same(enumerate_probabilities(people), eliminate_probabilities(people))
+
+
+def test_vectorize_probabilities():
+    """Test enumeration over blocks of assignments against enumeration"""
+    for i in range(3):
+        people = load_data(f"data/family{i}.csv")
+        probabilities = vectorize_probabilities(people, block=1000)
+        assert_same(enumerate_probabilities(people), probabilities)
+        assert all(probabilities[person]["trait"][value] >= 0 for person in people for value in [False, True])
+
+
+def test_prune_probabilities():
+    """Test lazily enumerated, pruned gene assignments against enumeration"""
+    for i in range(3):
+        people = load_data(f"data/family{i}.csv")
+        assert_same(enumerate_probabilities(people), prune_probabilities(people))
+    people = load_data("data/family2.csv")
+    assert sum(1 for _ in assignments(people)) == 3 ** len(people)
+    assert sum(1 for _ in assignments(people, 1e-6)) < 3 ** len(people)
+
+
+def test_parallel_probabilities():
+    """Test sharded enumeration on a process pool against enumeration"""
+    for i in range(3):
+        people = load_data(f"data/family{i}.csv")
+        assert_same(enumerate_probabilities(people), parallel_probabilities(people, processes=2))
+    assert_same(enumerate_probabilities(people), parallel_probabilities(people, processes=1, shards=3))
+
+
+def test_sample_probabilities():
+    """Test Gibbs sampling and likelihood weighting against exact inference"""
+    people = load_data("data/family2.csv")
+    expected = eliminate_probabilities(people)
+    for method in ["gibbs", "weighting"]:
+        probabilities, errors = sample_probabilities(people, method, 20000, chains=4, processes=2, seed=50)
+        for person in people:
+            for field in expected[person]:
+                for value in expected[person][field]:
+                    error = errors[person][field][value]
+                    assert abs(probabilities[person][field][value] - expected[person][field][value]) < 5 * error + 0.005
+                    assert error < 0.02
+
+
+def test_sample_probabilities_large():
+    """Test that sampling a family too large to multiply out stays finite"""
+    people = {}
+    for i in range(400):
+        name = f"Person {i}"
+        parents = (f"Person {i - 2}", f"Person {i - 1}") if i >= 2 else (None, None)
+        people[name] = {"name": name, "mother": parents[0], "father": parents[1], "trait": i % 3 == 0}
+    probabilities, errors = sample_probabilities(people, "gibbs", 2000, chains=2, seed=50)
+    for person in people:
+        assert abs(sum(probabilities[person]["gene"].values()) - 1) < 1e-9
+        assert all(np.isfinite(error) for error in errors[person]["gene"].values())
+
+
+def test_eliminate_probabilities_loop():
+    """Test elimination on a family where relatives have a child together"""
+    people = {
+        "A": {"name": "A", "mother": None, "father": None, "trait": True},
+        "B": {"name": "B", "mother": None, "father": None, "trait": None},
+        "C": {"name": "C", "mother": "A", "father": "B", "trait": None},
+        "D": {"name": "D", "mother": "A", "father": "B", "trait": False},
+        "E": {"name": "E", "mother": "C", "father": "D", "trait": True},
+        "F": {"name": "F", "mother": None, "father": None, "trait": None},
+        "G": {"name": "G", "mother": "E", "father": "F", "trait": None},
+    }
+    assert_same(enumerate_probabilities(people), eliminate_probabilities(people))
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+
+# Kinds of corpus `generate_corpus` can make
+GENERATORS = ("random", "power-law", "dangling")
+
+# Share of pages without links in "dangling" corpora
+DANGLING_SHARE = 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the PageRank engines on generated corpora."
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated numbers of pages to generate")
+    parser.add_argument("--generators", default=",".join(GENERATORS),
+                        help=f"comma-separated kinds of corpus, from {', '.join(GENERATORS)}")
+    parser.add_argument("--links", type=int, default=8,
+                        help="average links per page")
+    parser.add_argument("--samples", type=int, default=1000000,
+                        help="pages to sample with fast_sample_pagerank")
+    parser.add_argument("--reference-samples", type=int, default=1000,
+                        help="pages to sample with sample_pagerank")
+    parser.add_argument("--reference-limit", type=int, default=5000,
+                        help="largest corpus to run sample_pagerank and "
+                             "iterate_pagerank on")
+    parser.add_argument("--crawl-limit", type=int, default=100000,
+                        help="largest corpus to write out as HTML and crawl")
+    parser.add_argument("--block-columns", type=int, default=20,
+                        help="personalized rank vectors to compute together, "
+                             "and one at a time to compare")
+    parser.add_argument("--memory", action="store_true",
+                        help="run every step a second time to record its "
+                             "peak traced memory")
+    parser.add_argument("--output",
+                        help="write the results to this JSON file")
+    parser.add_argument("--seed", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for kind in args.generators.split(","):
+        for size in map(int, args.sizes.split(",")):
+            corpus = generate_corpus(size, args.links, rng, kind)
+            for record in benchmark(kind, corpus, args):
+                report(record)
+                results.append(record)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "cpus": os.cpu_count(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "arguments": vars(args),
+                "results": results,
+            }, f, indent=2)
+
+
+def generate_corpus(n_pages, links, rng, kind="random"):
+    """
+    Return a corpus dictionary of `n_pages` pages with `links` links per
+    page on average, of one of the GENERATORS kinds:
+
+    "random" gives each page a Poisson number of links to random pages.
+    "power-law" draws numbers of links from a Pareto distribution and
+    links to each page with chance proportional to 1 / its popularity rank.
+    "dangling" is like "random", but DANGLING_SHARE of pages have no links.
+    """
+    pages = [f"{i}.html" for i in range(n_pages)]
+    if kind == "random":
+        counts = rng.poisson(links, n_pages)
+        targets = rng.integers(0, n_pages, counts.sum())
+    elif kind == "power-law":
+        counts = rng.pareto(2, n_pages)
+        counts = np.minimum(np.rint(counts * links / max(counts.mean(), 1e-9)), n_pages)
+        counts = counts.astype(np.int64)
+        popularity = 1 / np.arange(1, n_pages + 1)
+        targets = rng.permutation(n_pages)[
+            rng.choice(n_pages, counts.sum(), p=popularity / popularity.sum())
+        ]
+    elif kind == "dangling":
+        counts = rng.poisson(links / (1 - DANGLING_SHARE), n_pages)
+        counts[rng.random(n_pages) < DANGLING_SHARE] = 0
+        targets = rng.integers(0, n_pages, counts.sum())
+    else:
+        raise ValueError(f"unknown kind of corpus {kind!r}, expected one of {GENERATORS}")
+
+    corpus = {}
+    start = 0
+    for i, count in enumerate(counts.tolist()):
+        corpus[pages[i]] = {pages[j] for j in targets[start:start + count].tolist()} - {pages[i]}
+        start += count
+    return corpus
+
+
+def write_corpus(directory, corpus):
+    """
+    Write every page of `corpus` to `directory` as an HTML file
+    linking to the pages it links to.
+    """
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write("<html><body>\n")
+            for link in sorted(links):
+                f.write(f'<a href="{link}">{link}</a>\n')
+            f.write("</body></html>\n")
+
+
+def measure(results, record, memory, function, *arguments):
+    """
+    Time `function(*arguments)`, and if `memory` is True run it again
+    to trace its peak memory. Append `record` with the measurements to
+    `results` and return what the function returned.
+    """
+    start = time.perf_counter()
+    value = function(*arguments)
+    record["seconds"] = time.perf_counter() - start
+    record["peak_bytes"] = None
+    if memory:
+        tracemalloc.start()
+        function(*arguments)
+        _, record["peak_bytes"] = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    results.append(record)
+    return value
+
+
+def report(record):
+    """
+    Print the measurements in a result record.
+    """
+    line = f"  {record['engine']:>30}: {record['seconds']:.3f}s"
+    if record["peak_bytes"] is not None:
+        line += f", {record['peak_bytes'] / 2 ** 20:.1f} MiB"
+    if "iterations" in record:
+        line += f", {record['iterations']} iterations"
+    if "ratio" in record:
+        line += f", {record['ratio']:.2f}x the time one by one"
+    if "difference" in record:
+        line += f", largest difference {record['difference']:.2e}"
+    print(line)
+
+
+def benchmark(kind, corpus, args):
+    """
+    Time the engines on `corpus` and return a list of result records,
+    noting how far each engine's ranks are from power iteration's.
+    """
+    n_links = sum(map(len, corpus.values()))
+    print(f"{kind}: {len(corpus)} pages, {n_links} links")
+    results = []
+
+    def record(engine, **fields):
+        return {"generator": kind, "pages": len(corpus), "links": n_links,
+                "engine": engine, **fields}
+
+    if len(corpus) <= args.crawl_limit:
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(directory, corpus)
+            if len(corpus) <= args.reference_limit:
+                measure(results, record("crawl"), args.memory,
+                        pagerank.crawl, directory)
+            measure(results, record("crawl_graph"), args.memory,
+                    lambda: pagerank.crawl_graph(directory, cache=False))
+            pagerank.crawl_graph(directory)
+            measure(results, record("crawl_graph (cached)"), args.memory,
+                    pagerank.crawl_graph, directory)
+
+    graph = measure(results, record("LinkGraph.from_corpus"), args.memory,
+                    pagerank.LinkGraph.from_corpus, corpus)
+    expected, _ = pagerank.solve_pagerank(graph, pagerank.DAMPING)
+    for method in pagerank.SOLVERS:
+        entry = record(f"solve_pagerank ({method})")
+        ranks, history = measure(results, entry, args.memory,
+                                 pagerank.solve_pagerank, graph, pagerank.DAMPING, method)
+        entry["iterations"] = len(history)
+        entry["difference"] = float(np.abs(ranks - expected).max())
+
+    # Personalized ranks for random single pages, all together and one by one
+    seeds = np.random.default_rng(args.seed).choice(len(corpus), args.block_columns)
+    teleports = pagerank.teleport_vectors(graph, [[graph.pages[i]] for i in seeds])
+    block = record(f"personalized ({args.block_columns} together)")
+    measure(results, block, args.memory, pagerank.personalized_power_iteration,
+            graph, teleports, pagerank.DAMPING)
+    single = record(f"personalized ({args.block_columns} one by one)")
+    measure(results, single, args.memory, lambda: [
+        pagerank.personalized_power_iteration(graph, teleports[:, [j]], pagerank.DAMPING)
+        for j in range(args.block_columns)
+    ])
+    block["ratio"] = block["seconds"] / single["seconds"]
+
+    entry = record("walk", samples=args.samples)
+    visits, _ = measure(results, entry, args.memory, pagerank.walk, graph,
+                        pagerank.DAMPING, args.samples, np.random.default_rng(args.seed))
+    entry["difference"] = float(np.abs(visits / args.samples - expected).max())
+
+    if len(corpus) > args.reference_limit:
+        print("  sample_pagerank, iterate_pagerank: skipped")
+        return results
+    expected = graph.to_dict(expected)
+    for engine, function, arguments in (
+        ("sample_pagerank", pagerank.sample_pagerank,
+         (corpus, pagerank.DAMPING, args.reference_samples)),
+        ("iterate_pagerank", pagerank.iterate_pagerank,
+         (corpus, pagerank.DAMPING)),
+    ):
+        entry = record(engine)
+        ranks = measure(results, entry, args.memory, function, *arguments)
+        entry["difference"] = max(abs(ranks[page] - expected[page]) for page in corpus)
+    return results
+
+
+if __name__ == "__main__":
+    main()
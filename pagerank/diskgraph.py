@@ -0,0 +1,239 @@
+import argparse
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from pagerank import DAMPING, MAX_ITERATIONS, TOLERANCE, crawl_links, scan_pages
+
+# Links and pages read from disk at a time
+EDGE_BLOCK = 1 << 22
+PAGE_BLOCK = 1 << 22
+
+# Files that links are spread over by target page while building a
+# graph, each then sorted in memory
+BUCKETS = 64
+
+# Lines of a text edge list parsed at a time
+READ_LINES = 1 << 20
+
+# File in a graph directory crawled from HTML pages holding the
+# (modification time in ns, size) of each page it was crawled from
+CRAWL_STAMPS = "stamps.npy"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank a link graph too large for memory from files on disk."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser(
+        "build", help="sort a text edge list into a graph directory"
+    )
+    build.add_argument("edges", help="file of \"source target\" page numbers, one link per line")
+    build.add_argument("directory")
+    build.add_argument("--pages", type=int,
+                       help="number of pages (default one more than the largest seen)")
+    rank = commands.add_parser("rank", help="rank the graph in a directory")
+    rank.add_argument("directory")
+    rank.add_argument("--top", type=int, default=10,
+                      help="highest-ranked pages to print")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        pages = args.pages
+        if pages is None:
+            pages = max(int(chunk.max()) for chunk in read_edge_list(args.edges)) + 1
+        graph = DiskGraph.create(args.directory, pages, (
+            (chunk[:, 0], chunk[:, 1]) for chunk in read_edge_list(args.edges)
+        ))
+        print(f"Built {graph.n} pages, {len(graph.edges)} links")
+    else:
+        ranks = disk_pagerank(args.directory, DAMPING)
+        print(f"Top {args.top} pages by PageRank")
+        for page, rank in top_pages(ranks, args.top):
+            print(f"  {page}: {rank:.6f}")
+
+
+def read_edge_list(path):
+    """
+    Yield (k, 2) arrays of the (source, target) page numbers on each
+    line of the text file at `path`, READ_LINES lines at a time.
+    """
+    with open(path, "rb") as f:
+        while True:
+            lines = f.readlines(READ_LINES * 16)
+            if not lines:
+                return
+            yield np.array(b" ".join(lines).split(), dtype=np.int64).reshape(-1, 2)
+
+
+class DiskGraph():
+    """
+    Link graph kept in NumPy files in `directory` and memory-mapped
+    instead of read into memory: edges.npy holds an (m, 2) array of the
+    (source, target) page of every link, sorted by target page, and
+    out_degree.npy the number of links from each page.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.edges = np.load(os.path.join(directory, "edges.npy"), mmap_mode="r")
+        self.out_degree = np.load(os.path.join(directory, "out_degree.npy"), mmap_mode="r")
+        self.n = len(self.out_degree)
+
+    @classmethod
+    def create(cls, directory, n_pages, chunks):
+        """
+        Write a graph of `n_pages` pages to `directory`, with the links
+        in `chunks`, an iterable of (sources, targets) arrays.
+
+        Links are first spread over BUCKETS files by target page and
+        then each file is sorted in memory, so only about one bucket of
+        links is held at a time.
+        """
+        os.makedirs(directory, exist_ok=True)
+        out_degree = open_memmap(
+            os.path.join(directory, "out_degree.npy"), mode="w+",
+            dtype=np.int32, shape=(n_pages,)
+        )
+        buckets = min(BUCKETS, max(n_pages, 1))
+        paths = [os.path.join(directory, f"bucket{i}.tmp") for i in range(buckets)]
+        files = [open(path, "wb") for path in paths]
+        total = 0
+        try:
+            for sources, targets in chunks:
+                links = np.column_stack((sources, targets)).astype(np.int32)
+                pages, counts = np.unique(links[:, 0], return_counts=True)
+                out_degree[pages] += counts.astype(np.int32)
+                bucket = links[:, 1].astype(np.int64) * buckets // n_pages
+                order = np.argsort(bucket, kind="stable")
+                ends = np.cumsum(np.bincount(bucket, minlength=buckets))
+                for i, part in enumerate(np.split(links[order], ends[:-1])):
+                    part.tofile(files[i])
+                total += len(links)
+        finally:
+            for f in files:
+                f.close()
+        out_degree.flush()
+        del out_degree
+
+        edges = open_memmap(
+            os.path.join(directory, "edges.npy"), mode="w+",
+            dtype=np.int32, shape=(total, 2)
+        )
+        start = 0
+        for path in paths:
+            links = np.fromfile(path, dtype=np.int32).reshape(-1, 2)
+            edges[start:start + len(links)] = links[np.argsort(links[:, 1], kind="stable")]
+            start += len(links)
+            os.remove(path)
+        edges.flush()
+        del edges
+        return cls(directory)
+
+    @classmethod
+    def from_graph(cls, directory, graph):
+        """
+        Write a `LinkGraph` to `directory` and return it as a `DiskGraph`.
+        """
+        return cls.create(directory, len(graph.pages), [(graph.sources, graph.targets)])
+
+    def step(self, ranks, following, damping_factor):
+        """
+        Write the ranks after one step of the random surfer from `ranks`
+        to `following`, like `LinkGraph.step`, streaming the links and
+        pages from disk a block at a time. Return the L1 change.
+        """
+        n = self.n
+        dangling = 0.0
+        for start in range(0, n, PAGE_BLOCK):
+            block = slice(start, start + PAGE_BLOCK)
+            dangling += ranks[block][self.out_degree[block] == 0].sum()
+        following[:] = (1 - damping_factor) / n + damping_factor * dangling / n
+
+        # Links are sorted by target, so each block adds to a run of pages
+        for start in range(0, len(self.edges), EDGE_BLOCK):
+            links = np.asarray(self.edges[start:start + EDGE_BLOCK])
+            sources = links[:, 0]
+            first = links[0, 1]
+            passed = np.bincount(
+                links[:, 1] - first,
+                weights=ranks[sources] / self.out_degree[sources]
+            )
+            following[first:first + len(passed)] += damping_factor * passed
+
+        change = 0.0
+        for start in range(0, n, PAGE_BLOCK):
+            block = slice(start, start + PAGE_BLOCK)
+            change += np.abs(following[block] - ranks[block]).sum()
+        return change
+
+
+def crawl_disk_graph(corpus, directory, processes=None):
+    """
+    Return the sorted names of the HTML pages in the `corpus` directory
+    and a `DiskGraph` in `directory` of the links between them, crawled
+    like `crawl_graph` but a batch of pages at a time straight into
+    `DiskGraph.create`. If the graph in `directory` was crawled from
+    the same pages and none has changed since, it is used as it is.
+    """
+    found = scan_pages(corpus)
+    pages = sorted(found)
+    stamps = np.array([found[page] for page in pages], dtype=np.int64).reshape(-1, 2)
+    path = os.path.join(directory, CRAWL_STAMPS)
+    try:
+        if np.array_equal(np.load(path), stamps):
+            return pages, DiskGraph(directory)
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
+    graph = DiskGraph.create(directory, len(pages), crawl_links(corpus, pages, processes))
+    np.save(path, stamps)
+    return pages, graph
+
+
+def disk_pagerank(directory, damping_factor, tolerance=TOLERANCE,
+                  max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of the `DiskGraph` in `directory`, found
+    by power iteration like `power_iteration`, as a read-only array
+    memory-mapped from ranks.npy in `directory`.
+    """
+    graph = DiskGraph(directory)
+    path = os.path.join(directory, "ranks.npy")
+    next_path = os.path.join(directory, "ranks.next.npy")
+    ranks = open_memmap(path, mode="w+", dtype=np.float64, shape=(graph.n,))
+    following = open_memmap(next_path, mode="w+", dtype=np.float64, shape=(graph.n,))
+    ranks[:] = 1 / graph.n
+    for _ in range(max_iterations):
+        change = graph.step(ranks, following, damping_factor)
+        ranks, following = following, ranks
+        if change < tolerance:
+            break
+    ranks.flush()
+    finished = ranks.filename
+    del ranks, following
+    if os.path.basename(finished) != "ranks.npy":
+        os.replace(finished, path)
+    else:
+        os.remove(next_path)
+    return np.load(path, mmap_mode="r")
+
+
+def top_pages(ranks, k):
+    """
+    Return the (page, rank) pairs of the `k` highest `ranks`, best
+    first, reading them a block at a time.
+    """
+    best = []
+    for start in range(0, len(ranks), PAGE_BLOCK):
+        block = np.asarray(ranks[start:start + PAGE_BLOCK])
+        top = np.argpartition(block, -min(k, len(block)))[-k:]
+        best.extend(zip((top + start).tolist(), block[top].tolist()))
+        best = sorted(best, key=lambda pair: -pair[1])[:k]
+    return best
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,124 @@
+import argparse
+import concurrent.futures
 import os
+import posixpath
 import random
 import re
-import sys
+import time
 import copy
+import multiprocessing
+import zipfile
+from array import array
+
+import numpy as np
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Stop power iteration once the ranks change by less than this in total
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 1000
+
+# Random numbers drawn at a time while sampling
+SAMPLE_BATCH = 100000
+
+# Most steps each walker takes between convergence checks when sampling
+# in parallel, and the z-score of the 95% confidence intervals reported
+WALK_ROUND = 100000
+CONFIDENCE = 1.96
+
+# Links in an HTML page
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a page at a time, and pages sent to a worker
+# process at a time, when crawling in parallel
+CRAWL_READ_SIZE = 65536
+CRAWL_CHUNK = 64
+MAX_TAG = 65536
+
+# Pages whose links are parsed and held at a time when crawling straight
+# to disk for out-of-core ranking
+CRAWL_BATCH = 65536
+
+# File in a corpus directory caching its crawled links
+CRAWL_CACHE = "pagerank.cache"
+CRAWL_CACHE_VERSION = 1
+
+# Methods of `solve_pagerank`, steps between extrapolations for the
+# extrapolating methods and blocks of pages updated in turn by Gauss-Seidel
+SOLVERS = ("power", "gauss-seidel", "aitken", "quadratic")
+EXTRAPOLATION_PERIOD = 10
+GAUSS_SEIDEL_BLOCKS = 64
+
+# Link contributions (links times rank vectors) gathered at a time
+# when ranking a block of personalized rank vectors together, few
+# enough to stay in cache
+BLOCK_ELEMENTS = 1 << 16
+
+# Link graph of the walkers in a parallel sampling worker process
+walk_graph = None
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
+    parser = argparse.ArgumentParser(description="Rank a corpus of HTML pages.")
+    parser.add_argument("corpus")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"pages to sample (default {SAMPLES})")
+    parser.add_argument("--walkers", type=int,
+                        help="sample with this many independent surfers "
+                             "in parallel and report confidence intervals")
+    parser.add_argument("--processes", type=int,
+                        help="processes for crawling and parallel sampling "
+                             "(default one per CPU)")
+    parser.add_argument("--tolerance", type=float,
+                        help="stop parallel sampling once every confidence "
+                             "interval half-width is below this")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"parse every page instead of reusing {CRAWL_CACHE}")
+    parser.add_argument("--method", choices=SOLVERS, default="power",
+                        help="how to iterate (default power)")
+    parser.add_argument("--show-iterations", action="store_true",
+                        help="print the change and time of every iteration")
+    parser.add_argument("--out-of-core", metavar="DIRECTORY",
+                        help="crawl the links to files in DIRECTORY, or reuse "
+                             "them if no page changed, and iterate over them "
+                             "there instead of sampling and iterating in "
+                             "memory (see diskgraph.py)")
+    args = parser.parse_args()
+
+    if args.out_of_core:
+        # Imported here, as diskgraph imports its defaults from this module
+        import diskgraph
+        pages, _ = diskgraph.crawl_disk_graph(args.corpus, args.out_of_core, args.processes)
+        ranks = diskgraph.disk_pagerank(args.out_of_core, DAMPING)
+        print("PageRank Results from Out-of-Core Iteration")
+        for i, page in enumerate(pages):
+            print(f"  {page}: {ranks[i]:.4f}")
+        return
+
+    corpus = crawl_graph(args.corpus, args.processes, cache=not args.no_cache)
+    if args.walkers:
+        ranks, errors = parallel_sample_pagerank(
+            corpus, DAMPING, args.samples, args.walkers, args.processes,
+            tolerance=args.tolerance
+        )
+        print(f"PageRank Results from Sampling (n = {args.samples}, "
+              f"{args.walkers} walkers)")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f} ± {errors[page]:.4f}")
+    else:
+        ranks = fast_sample_pagerank(corpus, DAMPING, args.samples)
+        print(f"PageRank Results from Sampling (n = {args.samples})")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+    ranks, history = solve_pagerank(corpus, DAMPING, args.method)
+    ranks = corpus.to_dict(ranks)
+    if args.show_iterations:
+        for iteration, (change, seconds) in enumerate(history, 1):
+            print(f"  iteration {iteration}: change {change:.3e}, {seconds * 1000:.3f} ms")
+    print(f"PageRank Results from Iteration ({args.method}, "
+          f"{len(history)} iterations, change {history[-1][0]:.1e}, "
+          f"{sum(seconds for _, seconds in history):.3f}s)")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
@@ -36,7 +137,7 @@ def crawl(directory):
             continue
         with open(os.path.join(directory, filename)) as f:
             contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            links = LINK_PATTERN.findall(contents)
             pages[filename] = set(links) - {filename}
 
     # Only include links to other pages in the corpus
@@ -49,6 +150,246 @@ def crawl(directory):
     return pages
 
 
+def crawl_graph(directory, processes=None, cache=True):
+    """
+    Parse every HTML page in `directory` and its subdirectories, like
+    `crawl`, but on a pool of `processes` processes (by default one per
+    CPU; 1 parses in this process) and return a `LinkGraph`.
+
+    Pages are named by their path relative to `directory`, with "/"
+    between directories, and links are resolved relative to the
+    directory of the page they appear on.
+
+    If `cache` is True, the links found are saved to CRAWL_CACHE in
+    `directory` along with each page's modification time and size,
+    and later crawls only parse the pages that were added or changed.
+    """
+    found = scan_pages(directory)
+    pages = sorted(found)
+    stamps = np.array(
+        [stamp for page in pages for stamp in found[page]], dtype=np.int64
+    ).reshape(-1, 2)
+    cached = load_crawl_cache(directory) if cache else None
+
+    # Nothing changed: reuse the cached graph as it is
+    if (cached is not None and cached["pages"] == pages
+            and np.array_equal(cached["stamps"], stamps)):
+        return LinkGraph(pages, cached["sources"], cached["targets"])
+
+    links = [None] * len(pages)
+    if cached is not None:
+        old_index = {page: i for i, page in enumerate(cached["pages"])}
+        old_links = cached_links(cached)
+        for i, page in enumerate(pages):
+            j = old_index.get(page)
+            if j is not None and np.array_equal(cached["stamps"][j], stamps[i]):
+                links[i] = old_links[j]
+
+    changed = [i for i in range(len(pages)) if links[i] is None]
+    parsed = parse_pages(
+        [os.path.join(directory, *pages[i].split("/")) for i in changed],
+        [pages[i] for i in changed],
+        processes
+    )
+    for i, page_links in zip(changed, parsed):
+        links[i] = page_links
+
+    index = {page: i for i, page in enumerate(pages)}
+    if cached is not None and cached["pages"] == pages:
+        # Same pages: patch the cached links, replacing those of changed pages
+        patch = link_graph(pages, index, (links[i] for i in changed), changed)
+        keep = np.ones(len(pages), dtype=bool)
+        keep[changed] = False
+        keep = keep[cached["sources"]]
+        graph = LinkGraph(
+            pages,
+            np.concatenate((cached["sources"][keep], patch.sources)),
+            np.concatenate((cached["targets"][keep], patch.targets))
+        )
+    else:
+        graph = link_graph(pages, index, links)
+
+    if cache:
+        try:
+            save_crawl_cache(directory, pages, stamps, graph, links)
+        except OSError:
+            pass
+    return graph
+
+
+def scan_pages(directory):
+    """
+    Return a dictionary mapping the relative path of every .html file
+    under `directory` to its (modification time in ns, size).
+    """
+    found = {}
+    folders = [(directory, "")]
+    while folders:
+        folder, prefix = folders.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                # Like os.walk, don't follow links to directories, which may loop
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append((entry.path, f"{prefix}{entry.name}/"))
+                elif entry.name.endswith(".html"):
+                    stat = entry.stat()
+                    found[prefix + entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+def parse_pages(paths, pages, processes=None):
+    """
+    Return the set of links of each page with `parse_page`, in order,
+    on a pool of `processes` processes when there are many pages.
+    """
+    if processes == 1 or len(pages) < CRAWL_CHUNK:
+        return list(map(parse_page, paths, pages))
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(parse_page, paths, pages, chunksize=CRAWL_CHUNK))
+
+
+def load_crawl_cache(directory):
+    """
+    Return the contents of the crawl cache in `directory` as a
+    dictionary, or None if there is none, it has another version, or
+    it is damaged or cut short.
+    """
+    try:
+        with np.load(os.path.join(directory, CRAWL_CACHE)) as data:
+            if int(data["version"]) != CRAWL_CACHE_VERSION:
+                return None
+            return {
+                "pages": unpack_strings(data["pages"]),
+                "stamps": data["stamps"],
+                "sources": data["sources"],
+                "targets": data["targets"],
+                "link_offsets": data["link_offsets"],
+                "links": data["links"],
+            }
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def cached_links(cached):
+    """
+    Return the list of link names of each page in a loaded crawl cache.
+    """
+    names = unpack_strings(cached["links"])
+    offsets = cached["link_offsets"].tolist()
+    return [names[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def save_crawl_cache(directory, pages, stamps, graph, links):
+    """
+    Save the crawled `graph`, each page's (mtime, size) `stamps` and the
+    links found on each page (including links outside the corpus, which
+    may be added later) to the crawl cache in `directory`.
+    """
+    link_offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    link_offsets[1:] = np.cumsum([len(page_links) for page_links in links])
+    path = os.path.join(directory, CRAWL_CACHE)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as f:
+        np.savez(
+            f,
+            version=np.array(CRAWL_CACHE_VERSION),
+            pages=pack_strings(pages),
+            stamps=stamps,
+            sources=graph.sources,
+            targets=graph.targets,
+            link_offsets=link_offsets,
+            links=pack_strings(link for page_links in links for link in page_links),
+        )
+    os.replace(partial, path)
+
+
+def pack_strings(strings):
+    """
+    Return `strings` joined by newlines as an array of UTF-8 bytes.
+    """
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def unpack_strings(data):
+    """
+    Return the list of strings packed by `pack_strings`.
+    """
+    text = data.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+
+def parse_page(path, page):
+    """
+    Return the set of pages linked to by the page at `path`, named
+    `page`, reading the file in chunks of CRAWL_READ_SIZE characters.
+    A tag cut off at the end of a chunk is carried over to the next,
+    unless it is already longer than MAX_TAG characters.
+    """
+    base = posixpath.dirname(page)
+    links = set()
+    carry = ""
+    with open(path, errors="replace") as f:
+        while True:
+            chunk = f.read(CRAWL_READ_SIZE)
+            if not chunk:
+                break
+            text = carry + chunk
+            for link in LINK_PATTERN.findall(text):
+                links.add(posixpath.normpath(posixpath.join(base, link)))
+            start = text.rfind("<")
+            carry = ""
+            if start != -1 and ">" not in text[start:] and len(text) - start <= MAX_TAG:
+                carry = text[start:]
+    return links
+
+
+def link_graph(pages, index, parsed, sources_of=None):
+    """
+    Return a `LinkGraph` of `pages` from the sets of links parsed for
+    each page in turn, keeping only links to other pages in the corpus.
+
+    If `sources_of` is given, the links are only those of the pages
+    numbered in it, in the same order.
+    """
+    if sources_of is None:
+        sources_of = range(len(pages))
+    return LinkGraph(pages, *link_arrays(index, parsed, sources_of))
+
+
+def link_arrays(index, parsed, sources_of):
+    """
+    Return (sources, targets) arrays of the links in the sets `parsed`
+    for the pages numbered in `sources_of`, in the same order, keeping
+    only links to other pages in `index`.
+    """
+    sources = array("i")
+    targets = array("i")
+    for i, links in zip(sources_of, parsed):
+        for link in links:
+            j = index.get(link)
+            if j is not None and j != i:
+                sources.append(i)
+                targets.append(j)
+    return sources, targets
+
+
+def crawl_links(directory, pages, processes=None):
+    """
+    Yield (sources, targets) arrays of the links between `pages` in
+    `directory`, parsing CRAWL_BATCH pages at a time with `parse_pages`,
+    so that only one batch of links is held in memory.
+    """
+    index = {page: i for i, page in enumerate(pages)}
+    for start in range(0, len(pages), CRAWL_BATCH):
+        batch = pages[start:start + CRAWL_BATCH]
+        parsed = parse_pages(
+            [os.path.join(directory, *page.split("/")) for page in batch],
+            batch, processes
+        )
+        sources, targets = link_arrays(index, parsed, range(start, start + len(batch)))
+        yield np.asarray(sources, dtype=np.int32), np.asarray(targets, dtype=np.int32)
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -173,6 +514,538 @@ def check_values(distribution, old_distribution):
         if abs(distribution[pagerank] - old_distribution[pagerank]) > 0.0001:
             return False
     return True 
+
+
+class LinkGraph():
+    """
+    Link graph with pages numbered from 0, in the order of `pages`.
+    Links are kept as two parallel NumPy arrays, so that link k goes
+    from page `sources[k]` to page `targets[k]`.
+    """
+
+    def __init__(self, pages, sources, targets):
+        self.pages = pages
+        self.sources = np.asarray(sources, dtype=np.int32)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.out_degree = np.bincount(self.sources, minlength=len(pages))
+        self.dangling = np.flatnonzero(self.out_degree == 0)
+
+        # Links grouped by source page: the links of page i are
+        # out_links[out_offsets[i]:out_offsets[i + 1]]
+        self.out_links = self.targets[np.argsort(self.sources, kind="stable")]
+        self.out_offsets = np.concatenate(([0], np.cumsum(self.out_degree)))
+
+        # Share of its rank each page passes along every one of its links
+        with np.errstate(divide="ignore"):
+            self.link_weights = (1 / self.out_degree)[self.sources]
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a corpus dictionary as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for page in pages:
+            i = index[page]
+            for link in corpus[page]:
+                sources.append(i)
+                targets.append(index[link])
+        return cls(pages, sources, targets)
+
+    def link_lists(self):
+        """
+        Return (out_links, out_offsets, out_degree) as Python lists,
+        which are faster than arrays to index one item at a time.
+        """
+        if not hasattr(self, "lists"):
+            self.lists = (
+                self.out_links.tolist(),
+                self.out_offsets.tolist(),
+                self.out_degree.tolist(),
+            )
+        return self.lists
+
+    def edit(self, added_pages=(), removed_pages=(), added_links=(),
+             removed_links=()):
+        """
+        Return (graph, kept): a new graph with the pages and the
+        (source, target) links named added and removed, and the old
+        number of each page kept, in their order in the new graph.
+        Removing a page removes its links too; added pages come last.
+        """
+        n = len(self.pages)
+        index = {page: i for i, page in enumerate(self.pages)}
+        keep = np.ones(n, dtype=bool)
+        keep[[index[page] for page in removed_pages]] = False
+        kept = np.flatnonzero(keep)
+        pages = [self.pages[i] for i in kept.tolist()]
+        pages.extend(page for page in dict.fromkeys(added_pages) if page not in index)
+
+        # Renumber the links left between kept pages
+        renumber = np.full(n, -1, dtype=np.int64)
+        renumber[kept] = np.arange(len(kept))
+        links = keep[self.sources] & keep[self.targets]
+        removed_links = set(removed_links)
+        if removed_links:
+            codes = self.sources.astype(np.int64) * n + self.targets
+            removed = [index[source] * n + index[target] for source, target in removed_links]
+            links &= ~np.isin(codes, removed)
+        sources = renumber[self.sources[links]]
+        targets = renumber[self.targets[links]]
+
+        # Add the new links that are not already there
+        new_index = {page: i for i, page in enumerate(pages)}
+        added = {}
+        for source, target in added_links:
+            i = index.get(source)
+            j = index.get(target)
+            if (source == target or i is not None and j is not None
+                    and (source, target) not in removed_links
+                    and j in self.out_links[self.out_offsets[i]:self.out_offsets[i + 1]]):
+                continue
+            added[new_index[source], new_index[target]] = None
+        if added:
+            added = np.array(list(added), dtype=np.int64)
+            sources = np.concatenate((sources, added[:, 0]))
+            targets = np.concatenate((targets, added[:, 1]))
+        return LinkGraph(pages, sources, targets), kept
+
+    def in_links(self):
+        """
+        Return (sources, targets, weights, offsets): the links sorted by
+        target page, so that the links into page i are those from
+        offsets[i] up to offsets[i + 1].
+        """
+        if not hasattr(self, "grouped"):
+            order = np.argsort(self.targets, kind="stable")
+            in_degree = np.bincount(self.targets, minlength=len(self.pages))
+            self.grouped = (
+                self.sources[order],
+                self.targets[order],
+                self.link_weights[order],
+                np.concatenate(([0], np.cumsum(in_degree))),
+            )
+        return self.grouped
+
+    def in_link_chunks(self, columns):
+        """
+        Yield (first, last) for runs of pages, in order, with about
+        BLOCK_ELEMENTS // `columns` links into them in all, so that
+        one row of `columns` ranks per link stays in cache.
+        """
+        offsets = self.in_links()[3]
+        limit = max(1, BLOCK_ELEMENTS // columns)
+        first = 0
+        while first < len(self.pages):
+            last = int(np.searchsorted(offsets, offsets[first] + limit, "right")) - 1
+            last = max(first + 1, last)
+            yield first, last
+            first = last
+
+    def in_link_sums(self, ranks, first, last):
+        """
+        Return the rows of the ranks passed along links into pages
+        `first` up to `last` from the rows of `ranks` of their sources.
+        """
+        sources, _, weights, offsets = self.in_links()
+        start, end = offsets[first], offsets[last]
+        sums = np.zeros((last - first, ranks.shape[1]))
+        if start == end:
+            return sums
+        contributions = np.take(ranks, sources[start:end], axis=0)
+        contributions *= weights[start:end, np.newaxis]
+        receiving = np.flatnonzero(np.diff(offsets[first:last + 1]))
+        sums[receiving] = np.add.reduceat(
+            contributions, offsets[first:last][receiving] - start, axis=0
+        )
+        return sums
+
+    def step_block(self, ranks, damping_factor, teleports):
+        """
+        Return the ranks after one step of the random surfer from each
+        column of `ranks`, where the surfer of column j teleports to
+        pages (and leaves pages without links for pages) in proportion
+        to column j of `teleports`.
+        """
+        following = np.empty_like(ranks)
+        for first, last in self.in_link_chunks(ranks.shape[1]):
+            following[first:last] = self.in_link_sums(ranks, first, last)
+        following += ranks[self.dangling].sum(axis=0) * teleports
+        return (1 - damping_factor) * teleports + damping_factor * following
+
+    def sweep_block(self, ranks, damping_factor, teleports):
+        """
+        Return the ranks after one block Gauss-Seidel sweep from each
+        column of `ranks`, like `sweep` but teleporting as in
+        `step_block`, a run of pages from `in_link_chunks` at a time.
+        """
+        ranks = ranks.copy()
+        is_dangling = self.out_degree == 0
+        dangling = ranks[is_dangling].sum(axis=0)
+        for first, last in self.in_link_chunks(ranks.shape[1]):
+            block = slice(first, last)
+            following = (1 - damping_factor) * teleports[block] + damping_factor * (
+                self.in_link_sums(ranks, first, last) + dangling * teleports[block]
+            )
+            block_dangling = is_dangling[block]
+            dangling += (following[block_dangling] - ranks[block][block_dangling]).sum(axis=0)
+            ranks[block] = following
+        # The ranks only sum to 1 once converged, so rescale them
+        return ranks / ranks.sum(axis=0)
+
+    def sweep(self, ranks, damping_factor, blocks=GAUSS_SEIDEL_BLOCKS):
+        """
+        Return the ranks after one block Gauss-Seidel sweep from `ranks`:
+        like `step`, but updating the pages a block at a time, so that
+        later blocks already use the new ranks of earlier ones.
+        """
+        n = len(self.pages)
+        ranks = ranks.copy()
+        sources, targets, weights, offsets = self.in_links()
+        is_dangling = self.out_degree == 0
+        dangling = ranks[is_dangling].sum()
+        bounds = np.linspace(0, n, min(blocks, n) + 1).astype(np.int64)
+        for first, last in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            links = slice(offsets[first], offsets[last])
+            following = np.bincount(
+                targets[links] - first,
+                weights=ranks[sources[links]] * weights[links],
+                minlength=last - first
+            )
+            following = (1 - damping_factor) / n + damping_factor * (following + dangling / n)
+            block_dangling = is_dangling[first:last]
+            dangling += (following[block_dangling] - ranks[first:last][block_dangling]).sum()
+            ranks[first:last] = following
+        # The ranks only sum to 1 once converged, so rescale them
+        return ranks / ranks.sum()
+
+    def to_dict(self, ranks):
+        """
+        Return a dictionary mapping each page name to its value in `ranks`.
+        """
+        return dict(zip(self.pages, ranks.tolist()))
+
+    def step(self, ranks, damping_factor):
+        """
+        Return the ranks after one step of the random surfer from `ranks`.
+        Pages without links pass their rank to every page equally.
+        """
+        n = len(self.pages)
+        following = np.bincount(
+            self.targets, weights=ranks[self.sources] * self.link_weights,
+            minlength=n
+        )
+        following += ranks[self.dangling].sum() / n
+        return (1 - damping_factor) / n + damping_factor * following
+
+
+def as_graph(corpus):
+    """
+    Return `corpus` as a `LinkGraph`, building one if it is a corpus
+    dictionary as returned by `crawl`.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Return the PageRank vector of a `LinkGraph`, starting from `ranks`
+    (uniform ranks by default) and stepping until the L1 change between
+    two iterations is below `tolerance` or after `max_iterations` steps.
+    """
+    ranks, _ = solve_pagerank(graph, damping_factor, "power", tolerance,
+                              max_iterations, ranks)
+    return ranks
+
+
+def solve_pagerank(graph, damping_factor, method="power", tolerance=TOLERANCE,
+                   max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Return (ranks, history): the PageRank vector of a `LinkGraph` found
+    by `method`, one of SOLVERS, and a list with the L1 change and the
+    seconds taken in each iteration, stopping like `power_iteration`.
+
+    "power" steps the random surfer, "gauss-seidel" sweeps through
+    blocks of pages using the newest ranks, and "aitken" and
+    "quadratic" step like "power" but every EXTRAPOLATION_PERIOD steps
+    jump to the limit extrapolated from the last three or four ranks,
+    unless that would slow convergence down.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"unknown method {method!r}, expected one of {SOLVERS}")
+    n = len(graph.pages)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    recent = [ranks]
+    history = []
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        if method == "gauss-seidel":
+            following = graph.sweep(ranks, damping_factor)
+        else:
+            following = graph.step(ranks, damping_factor)
+        change = np.abs(following - ranks).sum()
+        if method in ("aitken", "quadratic"):
+            recent.append(following)
+            del recent[:-4]
+            if iteration % EXTRAPOLATION_PERIOD == 0 and change >= tolerance:
+                # Keep the estimate only if a step from it changes less
+                estimate = extrapolate(recent, method)
+                stepped = graph.step(estimate, damping_factor)
+                if np.abs(stepped - estimate).sum() < change:
+                    following = stepped
+                recent = [following]
+        ranks = following
+        history.append((change, time.perf_counter() - start))
+        if change < tolerance:
+            break
+    return ranks, history
+
+
+def extrapolate(recent, method):
+    """
+    Return the rank vector estimated from the last few successive
+    `recent` rank vectors by Aitken (from three) or quadratic (from
+    four) extrapolation, as in Kamvar et al., "Extrapolation methods
+    for accelerating PageRank computations".
+    """
+    if method == "aitken":
+        before, previous, last = recent[-3:]
+        differences = last - previous
+        curvature = last - 2 * previous + before
+        with np.errstate(divide="ignore", invalid="ignore"):
+            estimate = np.where(
+                curvature != 0, last - differences ** 2 / curvature, last
+            )
+    else:
+        first, before, previous, last = recent[-4:]
+        changes = np.column_stack((before - first, previous - first))
+        (gamma1, gamma2), *_ = np.linalg.lstsq(changes, first - last, rcond=None)
+        estimate = ((gamma1 + gamma2 + 1) * before + (gamma2 + 1) * previous + last)
+    estimate = np.maximum(estimate, 0)
+    total = estimate.sum()
+    if not np.isfinite(total) or total == 0:
+        return recent[-1]
+    return estimate / total
+
+
+def teleport_vectors(graph, seeds):
+    """
+    Return an array with a column for each item of `seeds` giving the
+    chance of teleporting to each page of a `LinkGraph`. An item may be
+    a collection of pages, teleported to equally, or a dictionary
+    mapping pages to relative weights.
+    """
+    index = {page: i for i, page in enumerate(graph.pages)}
+    teleports = np.zeros((len(graph.pages), len(seeds)))
+    for j, seed in enumerate(seeds):
+        if not isinstance(seed, dict):
+            seed = dict.fromkeys(seed, 1)
+        for page, weight in seed.items():
+            teleports[index[page], j] += weight
+    totals = teleports.sum(axis=0)
+    if not np.all(totals > 0):
+        raise ValueError("every teleport vector needs a page with positive weight")
+    return teleports / totals
+
+
+def personalized_power_iteration(graph, teleports, damping_factor,
+                                 tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS):
+    """
+    Return an array of personalized PageRank vectors of a `LinkGraph`,
+    one column per column of `teleports`, swept together by block
+    Gauss-Seidel (see `LinkGraph.sweep_block`). Each column stops once
+    its L1 change is below `tolerance`, or after `max_iterations` sweeps.
+    """
+    teleports = np.asarray(teleports, dtype=np.float64)
+    ranks = teleports.copy()
+    active = np.arange(ranks.shape[1])
+    for _ in range(max_iterations):
+        previous = ranks[:, active]
+        following = graph.sweep_block(previous, damping_factor, teleports[:, active])
+        change = np.abs(following - previous).sum(axis=0)
+        ranks[:, active] = following
+        active = active[change >= tolerance]
+        if len(active) == 0:
+            break
+    return ranks
+
+
+def update_pagerank(graph, ranks, damping_factor, added_pages=(),
+                    removed_pages=(), added_links=(), removed_links=(),
+                    tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return (graph, ranks) after editing a `LinkGraph` whose PageRank
+    vector is `ranks`, as in `LinkGraph.edit`.
+
+    Power iteration starts from the old ranks of the pages kept (and
+    uniform ranks for added pages), so after a few edits it only has
+    to correct the ranks near them instead of starting over.
+    """
+    graph, kept = as_graph(graph).edit(
+        added_pages, removed_pages, added_links, removed_links
+    )
+    start = np.full(len(graph.pages), 1 / len(graph.pages))
+    start[:len(kept)] = np.asarray(ranks)[kept]
+    start /= start.sum()
+    return graph, power_iteration(graph, damping_factor, tolerance,
+                                  max_iterations, ranks=start)
+
+
+def walk(graph, damping_factor, n, rng, page=None):
+    """
+    Take `n` steps of a random surfer on a `LinkGraph`, starting from
+    `page` (or a random page). Return how often each page was visited,
+    and the page the surfer ends on.
+
+    Each page's transition distribution is a mix of two uniform choices,
+    so a step is sampled in O(1) without building the distribution:
+    with probability `1 - damping_factor`, or from a page without links,
+    jump to a random page; otherwise follow a random link, looked up by
+    offset in the links grouped by source page.
+    """
+    n_pages = len(graph.pages)
+    out_links, out_offsets, out_degree = graph.link_lists()
+    visits = [0] * n_pages
+    if page is None:
+        page = int(rng.integers(n_pages))
+
+    remaining = n
+    while remaining:
+        batch = min(remaining, SAMPLE_BATCH)
+        remaining -= batch
+        follows = (rng.random(batch) < damping_factor).tolist()
+        choices = rng.random(batch).tolist()
+        jumps = rng.integers(0, n_pages, batch).tolist()
+        for i in range(batch):
+            visits[page] += 1
+            degree = out_degree[page]
+            if follows[i] and degree:
+                page = out_links[out_offsets[page] + int(choices[i] * degree)]
+            else:
+                page = jumps[i]
+    return np.array(visits), page
+
+
+def fast_sample_pagerank(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page, like `sample_pagerank`, by
+    sampling `n` pages with `walk`, so each sample takes O(1) time
+    instead of rebuilding the transition model.
+
+    `seed` seeds the random number generator, for repeatable results.
+    `corpus` may also be a `LinkGraph`.
+    """
+    if n < 1:
+        raise AttributeError("n must be >= 1")
+    graph = as_graph(corpus)
+    visits, _ = walk(graph, damping_factor, n, np.random.default_rng(seed))
+    return graph.to_dict(visits / n)
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=8,
+                             processes=None, seed=None, tolerance=None):
+    """
+    Return (ranks, errors) for each page by running `walkers` independent
+    random surfers, each with its own seeded random number generator,
+    on a pool of `processes` processes (by default one per CPU), and
+    merging their visit counts.
+
+    `errors` maps each page to the half-width of the 95% confidence
+    interval of its rank, estimated from the spread between walkers.
+    The surfers take up to `n` steps between them, in rounds; if
+    `tolerance` is given, sampling stops early once every half-width
+    is below it. `corpus` may also be a `LinkGraph`.
+    """
+    if n < 1:
+        raise AttributeError("n must be >= 1")
+    if walkers < 2:
+        raise ValueError("need at least 2 walkers to estimate errors")
+    graph = as_graph(corpus)
+    rngs = [
+        np.random.default_rng(child)
+        for child in np.random.SeedSequence(seed).spawn(walkers)
+    ]
+    pages = [None] * walkers
+    visits = np.zeros((walkers, len(graph.pages)))
+    steps = 0
+
+    with multiprocessing.Pool(processes, initializer=set_walk_graph,
+                              initargs=(graph,)) as pool:
+        while steps < n:
+            # Each round, every walker takes an equal share of the steps
+            # still to go, up to WALK_ROUND
+            share = max(1, min(WALK_ROUND, (n - steps) // walkers))
+            tasks = [(rngs[w], pages[w], share, damping_factor) for w in range(walkers)]
+            for w, (counts, page, rng) in enumerate(pool.map(walk_round, tasks)):
+                visits[w] += counts
+                pages[w] = page
+                rngs[w] = rng
+            steps += share * walkers
+
+            estimates = visits / visits.sum(axis=1, keepdims=True)
+            errors = CONFIDENCE * estimates.std(axis=0, ddof=1) / np.sqrt(walkers)
+            if tolerance is not None and errors.max() < tolerance:
+                break
+
+    ranks = visits.sum(axis=0) / visits.sum()
+    return graph.to_dict(ranks), graph.to_dict(errors)
+
+
+def set_walk_graph(graph):
+    """
+    Keep `graph` for `walk_round` calls in this worker process.
+    """
+    global walk_graph
+    walk_graph = graph
+
+
+def walk_round(task):
+    """
+    Continue one walker of `parallel_sample_pagerank` for a round and
+    return its visit counts, its last page and its random number generator.
+    """
+    rng, page, steps, damping_factor = task
+    counts, page = walk(walk_graph, damping_factor, steps, rng, page)
+    return counts, page, rng
+
+
+def vectorized_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                        max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page, like `iterate_pagerank`, but
+    by NumPy power iteration over the sparse link graph, built once.
+
+    Pages with no links are treated as having one link to every page
+    in the corpus (including themselves). `corpus` may also be a
+    `LinkGraph`.
+    """
+    graph = as_graph(corpus)
+    ranks = power_iteration(graph, damping_factor, tolerance, max_iterations)
+    return graph.to_dict(ranks)
+
+
+def personalized_pagerank(corpus, seeds, damping_factor, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS):
+    """
+    Return a list of PageRank dictionaries, one for each item of `seeds`,
+    where the random surfer teleports (and leaves pages without links)
+    only to the seed pages instead of to any page, as in
+    `teleport_vectors`. `corpus` may also be a `LinkGraph`.
+    """
+    graph = as_graph(corpus)
+    ranks = personalized_power_iteration(
+        graph, teleport_vectors(graph, seeds), damping_factor,
+        tolerance, max_iterations
+    )
+    return [graph.to_dict(column) for column in ranks.T]
     
 if __name__ == "__main__":
     main()
@@ -1,4 +1,7 @@
+import os
+
 from pagerank import *
+import diskgraph
 
 def test_transition_model():
     """Test transition model"""
@@ -8,6 +11,198 @@ def test_transition_model():
     assert transition_model(corpus, page, damping_factor) == {"1.html": 0.05, "2.html": 0.475, "3.html": 0.475}
 
 
+def test_crawl_graph():
+    """Test that the parallel crawler finds the same links as crawl"""
+    for directory in ["corpus0", "corpus1", "corpus2"]:
+        corpus = crawl(directory)
+        graph = crawl_graph(directory, processes=2, cache=False)
+        assert graph.pages == sorted(corpus)
+        links = {(graph.pages[s], graph.pages[t]) for s, t in zip(graph.sources, graph.targets)}
+        assert links == {(page, link) for page in corpus for link in corpus[page]}
+
+
+def test_crawl_graph_cache(tmp_path):
+    """Test that cached crawls pick up changed, added and removed pages"""
+    def write(page, links):
+        path = tmp_path / page
+        path.write_text("".join(f'<a href="{link}">x</a>' for link in links))
+        os.utime(path, ns=(path.stat().st_mtime_ns + 10 ** 9,) * 2)
+
+    def links(graph):
+        return {(graph.pages[s], graph.pages[t]) for s, t in zip(graph.sources, graph.targets)}
+
+    write("1.html", ["2.html", "3.html"])
+    write("2.html", ["1.html"])
+    write("3.html", ["4.html"])
+    assert links(crawl_graph(tmp_path)) == {("1.html", "2.html"), ("1.html", "3.html"), ("2.html", "1.html")}
+    assert links(crawl_graph(tmp_path)) == {("1.html", "2.html"), ("1.html", "3.html"), ("2.html", "1.html")}
+
+    write("2.html", ["3.html"])
+    assert links(crawl_graph(tmp_path)) == {("1.html", "2.html"), ("1.html", "3.html"), ("2.html", "3.html")}
+
+    write("4.html", ["1.html"])
+    (tmp_path / "2.html").unlink()
+    graph = crawl_graph(tmp_path)
+    assert graph.pages == ["1.html", "3.html", "4.html"]
+    assert links(graph) == {("1.html", "3.html"), ("3.html", "4.html"), ("4.html", "1.html")}
+
+    cache = (tmp_path / CRAWL_CACHE).read_bytes()
+    for damaged in [cache[:len(cache) // 2], cache[:10], b"x" * 100]:
+        (tmp_path / CRAWL_CACHE).write_bytes(damaged)
+        assert links(crawl_graph(tmp_path)) == links(graph)
+
+
+def test_crawl_graph_small_reads(monkeypatch):
+    """Test that links cut across reads of a few characters are still found"""
+    expected = crawl("corpus1")
+    for size in range(1, 14):
+        monkeypatch.setattr("pagerank.CRAWL_READ_SIZE", size)
+        graph = crawl_graph("corpus1", processes=1, cache=False)
+        links = {(graph.pages[s], graph.pages[t]) for s, t in zip(graph.sources, graph.targets)}
+        assert links == {(page, link) for page in expected for link in expected[page]}
+
+
+def test_crawl_graph_symlink_loop(tmp_path):
+    """Test that links to directories are not followed"""
+    (tmp_path / "1.html").write_text('<a href="sub/2.html">x</a>')
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "2.html").write_text('<a href="../1.html">x</a>')
+    (tmp_path / "sub" / "loop").symlink_to(tmp_path)
+    graph = crawl_graph(tmp_path, cache=False)
+    assert graph.pages == ["1.html", "sub/2.html"]
+    assert len(graph.sources) == 2
+
+
+def test_vectorized_pagerank():
+    """Test vectorized power iteration against iterate_pagerank"""
+    corpus = crawl("corpus0")
+    expected = iterate_pagerank(corpus, DAMPING)
+    ranks = vectorized_pagerank(corpus, DAMPING)
+    assert ranks.keys() == expected.keys()
+    for page in ranks:
+        assert abs(ranks[page] - expected[page]) < 0.001
+
+
+def test_fast_sample_pagerank():
+    """Test O(1)-per-step sampling against power iteration"""
+    corpus = crawl("corpus2")
+    expected = vectorized_pagerank(corpus, DAMPING)
+    ranks = fast_sample_pagerank(corpus, DAMPING, 100000, seed=50)
+    assert abs(sum(ranks.values()) - 1) < 1e-9
+    for page in ranks:
+        assert abs(ranks[page] - expected[page]) < 0.01
+
+
+def test_parallel_sample_pagerank():
+    """Test that parallel walkers agree with power iteration"""
+    corpus = crawl("corpus1")
+    expected = vectorized_pagerank(corpus, DAMPING)
+    ranks, errors = parallel_sample_pagerank(corpus, DAMPING, 100000, walkers=4, processes=2, seed=50)
+    assert abs(sum(ranks.values()) - 1) < 1e-9
+    for page in ranks:
+        assert 0 < errors[page] < 0.01
+        assert abs(ranks[page] - expected[page]) < 0.01
+
+
+def test_vectorized_pagerank_dangling():
+    """Test that pages without links share their rank with every page"""
+    corpus = {"1.html": {"2.html"}, "2.html": set()}
+    ranks = vectorized_pagerank(corpus, DAMPING)
+    assert abs(sum(ranks.values()) - 1) < 1e-9
+    assert abs(ranks["1.html"] - 0.5 / 1.425) < 1e-6
+
+
+def test_update_pagerank():
+    """Test that updating ranks after edits matches ranking from scratch"""
+    corpus = crawl("corpus1")
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = power_iteration(graph, DAMPING)
+    graph, ranks = update_pagerank(
+        graph, ranks, DAMPING,
+        added_pages=["new.html"], removed_pages=["games.html"],
+        added_links=[("new.html", "bfs.html"), ("bfs.html", "new.html")],
+        removed_links=[("search.html", "dfs.html")]
+    )
+
+    del corpus["games.html"]
+    for page in corpus:
+        corpus[page].discard("games.html")
+    corpus["search.html"].discard("dfs.html")
+    corpus["bfs.html"].add("new.html")
+    corpus["new.html"] = {"bfs.html"}
+    expected = vectorized_pagerank(corpus, DAMPING)
+    assert sorted(graph.pages) == sorted(expected)
+    for page, rank in graph.to_dict(ranks).items():
+        assert abs(rank - expected[page]) < 1e-8
+
+
+def test_personalized_pagerank():
+    """Test personalized PageRank for several teleport vectors at once"""
+    corpus = crawl("corpus2")
+    seeds = [list(corpus), {"ai.html"}, {"python.html": 3, "c.html": 1}]
+    uniform, ai, python = personalized_pagerank(corpus, seeds, DAMPING)
+    expected = vectorized_pagerank(corpus, DAMPING)
+    for page in corpus:
+        assert abs(uniform[page] - expected[page]) < 1e-8
+    assert abs(sum(ai.values()) - 1) < 1e-8
+    assert ai["ai.html"] > expected["ai.html"]
+    [alone] = personalized_pagerank(corpus, seeds[2:], DAMPING)
+    for page in corpus:
+        assert abs(python[page] - alone[page]) < 1e-8
+
+
+def test_solve_pagerank():
+    """Test that every solver converges to the same ranks, reporting each iteration"""
+    graph = LinkGraph.from_corpus(crawl("corpus2"))
+    expected, history = solve_pagerank(graph, DAMPING, "power")
+    assert history[-1][0] < TOLERANCE
+    assert all(change >= TOLERANCE for change, _ in history[:-1])
+    for method in SOLVERS:
+        ranks, accelerated = solve_pagerank(graph, DAMPING, method)
+        assert np.abs(ranks - expected).sum() < 1e-8
+        if method != "power":
+            assert len(accelerated) < len(history)
+
+
+def test_extrapolate():
+    """Test that extrapolation recovers the limit of a geometric sequence"""
+    limit = np.array([0.3, 0.7])
+    recent = [limit + np.array([0.2, -0.2]) * 0.5 ** k for k in range(4)]
+    for method in ["aitken", "quadratic"]:
+        assert np.allclose(extrapolate(recent, method), limit, atol=1e-12)
+
+
+def test_disk_pagerank(tmp_path, monkeypatch):
+    """Test out-of-core power iteration over small blocks against power iteration"""
+    monkeypatch.setattr(diskgraph, "EDGE_BLOCK", 3)
+    monkeypatch.setattr(diskgraph, "PAGE_BLOCK", 5)
+    monkeypatch.setattr(diskgraph, "BUCKETS", 3)
+    graph = LinkGraph.from_corpus(crawl("corpus2"))
+    diskgraph.DiskGraph.from_graph(tmp_path, graph)
+    ranks = diskgraph.disk_pagerank(tmp_path, DAMPING)
+    assert np.abs(ranks - power_iteration(graph, DAMPING)).sum() < 1e-9
+    assert sorted(os.listdir(tmp_path)) == ["edges.npy", "out_degree.npy", "ranks.npy"]
+
+
+def test_crawl_disk_graph(tmp_path, monkeypatch):
+    """Test crawling a few pages at a time to disk, reusing the graph while no page changes"""
+    monkeypatch.setattr("pagerank.CRAWL_BATCH", 3)
+    expected = crawl_graph("corpus2", cache=False)
+    pages, graph = diskgraph.crawl_disk_graph("corpus2", tmp_path)
+    assert pages == expected.pages
+    assert len(graph.edges) == len(expected.sources)
+    ranks = diskgraph.disk_pagerank(tmp_path, DAMPING)
+    assert np.abs(ranks - power_iteration(expected, DAMPING)).sum() < 1e-9
+
+    def crawl_links(*arguments):
+        raise AssertionError("crawled again")
+
+    monkeypatch.setattr(diskgraph, "crawl_links", crawl_links)
+    pages, graph = diskgraph.crawl_disk_graph("corpus2", tmp_path)
+    assert pages == expected.pages
+    assert len(graph.edges) == len(expected.sources)
+
+
 corpus2 = {"1.html": {"2.html", "3.html"}, "2.html": {"3.html"}, "3.html": {"2.html"}}
 # corpus = corpus2.copy()
 # for page in corpus: